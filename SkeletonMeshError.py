@@ -1,6 +1,9 @@
 import pymeshlab as mlab
 import numpy as np
 from src import Swc
+from src.mesh_io import load_mesh
+from src.get_mesh_stats import skeleton_mesh_error
+from src.cache import content_hash, cache_file, load_array, save_array
 import sys
 import matplotlib as mpl
 import matplotlib.pyplot as plt
@@ -8,7 +11,53 @@ import time
 import argparse
 
 
-def main(mesh_path, source, output, save_pc=False, soma_mesh=None):
+def point_cloud(source, soma_mesh=None, cache_dir=None, density=1.0, cache_swc=False):
+    """Point cloud over the surface of a Swc file, and of a separate soma mesh.
+
+    Args:
+        source (string): path to Swc file
+        soma_mesh (string, optional): Path to separate Soma mesh. Defaults to None.
+        cache_dir (string, optional): Directory caching the point clouds, keyed by the contents of the
+        Swc file and soma mesh and by density. Defaults to None, which does not cache.
+        density (float, optional): Density of the point cloud. Defaults to 1.0.
+        cache_swc (bool, optional): Flag to load the Swc file from the Swc cache. Defaults to False.
+
+    Returns:
+        points (ndarray): points of the point cloud, size [npoint x 3].
+    """
+    if cache_dir is not None:
+        files = [source] if soma_mesh is None else [source, soma_mesh]
+        name = cache_file(cache_dir, "pc", content_hash(files, density=density))
+        points = load_array(name)
+        if points is not None:
+            print(f"Loaded point cloud of {source} from {name}")
+            return points
+
+    # Load Swc file
+    swc = Swc(source, process=False, cache=cache_swc)
+
+    # Load Soma mesh if it exists and make point cloud
+    ms_pc = swc.make_point_cloud(density)
+    if soma_mesh is not None:
+        ms_soma = load_mesh(soma_mesh)
+        ms_pc = swc.add_mesh_to_point_cloud(ms_soma, includemesh=True)
+    points = ms_pc.current_mesh().vertex_matrix()
+
+    if cache_dir is not None:
+        save_array(name, points)
+    return points
+
+
+def main(
+    mesh_path,
+    source,
+    output,
+    save_pc=False,
+    soma_mesh=None,
+    cache_dir=None,
+    density=1.0,
+    cache_swc=False,
+):
     """Calculate Skeleton to Mesh error for watertight surface mesh generated from Swc file.
 
     Args:
@@ -17,48 +66,26 @@ def main(mesh_path, source, output, save_pc=False, soma_mesh=None):
         output (string): path to output file
         save_pc (bool, optional): Flag to save point cloud. Defaults to False.
         soma_mesh (string, optional): Path to separate Soma mesh. Defaults to None.
+        cache_dir (string, optional): Directory caching the point clouds, see point_cloud. Defaults to None.
+        density (float, optional): Density of the point cloud. Defaults to 1.0.
+        cache_swc (bool, optional): Flag to load the Swc file from the Swc cache. Defaults to False.
+
+    Returns:
+        dist (dict): Skeleton to Mesh Error summary.
     """
     start = time.time()
 
     # Load mesh
-    ms = mlab.MeshSet()
-    ms.load_new_mesh(mesh_path)
+    ms = load_mesh(mesh_path)
     # Filter out disconnected components
     ms.compute_selection_by_small_disconnected_components_per_face(nbfaceratio=0.99)
     ms.meshing_remove_selected_vertices_and_faces()
 
-    # Load Swc file
-    swc = Swc(source, process=False)
-
-    # Load Soma mesh if it exists and make point cloud
-    if soma_mesh is not None:
-        swc.make_point_cloud()
-        ms_soma = mlab.MeshSet()
-        ms_soma.load_new_mesh(soma_mesh)
-        ms_pc = swc.add_mesh_to_point_cloud(ms_soma, includemesh=True)
-    else:
-        ms_pc = swc.make_point_cloud()
-
-    # Add point cloud to mesh set
-    ms.add_mesh(ms_pc.current_mesh())
+    # Make point cloud
+    points = point_cloud(source, soma_mesh, cache_dir, density, cache_swc)
 
     # Compute distance field
-    ms.compute_scalar_by_distance_from_another_mesh_per_vertex(
-        measuremesh=1, refmesh=0, signeddist=False
-    )
-    d = ms.current_mesh().vertex_scalar_array()
-
-    # Extract summary statistics
-    bbox_swc = ms.get_geometric_measures()["bbox"]
-    ms.set_current_mesh(0)
-    bbox_mesh = ms.get_geometric_measures()["bbox"]
-    dist = {}
-    dist["RMS"] = np.sqrt(np.mean(d**2))
-    dist["max"] = np.max(d)
-    dist["mean"] = np.mean(d)
-    dist["min"] = np.min(d)
-    dist["diag_swc"] = bbox_swc.diagonal()
-    dist["diag_mesh"] = bbox_mesh.diagonal()
+    dist, d = skeleton_mesh_error(ms, points, return_distances=True)
 
     # Output summary information
     print("Surface error information")
@@ -72,12 +99,15 @@ def main(mesh_path, source, output, save_pc=False, soma_mesh=None):
 
     # Save point cloud if desired
     if save_pc:
+        pcname = output.replace(".txt", "_pc.ply")
+
         # Create color map from distance field
-        ms.set_current_mesh(1)
-        ms.compute_color_from_scalar_per_vertex(colormap="Viridis")
+        ms_pc = mlab.MeshSet()
+        ms_pc.add_mesh(mlab.Mesh(vertex_matrix=points, v_scalar_array=d))
+        ms_pc.compute_color_from_scalar_per_vertex(colormap="Viridis")
 
         # Save point cloud
-        ms.save_current_mesh(pcname, binary=False)
+        ms_pc.save_current_mesh(pcname, binary=False)
 
         # Save color bar for later plot
         cbar_name = pcname.replace("_pc.ply", "_cbar.png")
@@ -96,6 +126,7 @@ def main(mesh_path, source, output, save_pc=False, soma_mesh=None):
 
     # Print elapsed time
     print(f"Elapsed time = {time.time() -start:.2f} s")
+    return dist
 
 
 if __name__ == "__main__":
@@ -118,6 +149,12 @@ if __name__ == "__main__":
         default=0,
         type=int,
     )
+    parser.add_argument(
+        "--cache_swc",
+        help="Flag to cache the read swc file and reuse it in later runs",
+        default=0,
+        type=int,
+    )
 
     # Parse args
     args = parser.parse_args()
@@ -127,9 +164,5 @@ if __name__ == "__main__":
     soma_mesh = args.soma_mesh
     save_pc = args.save_pc == 1
 
-    # Create path to save point cloud
-    if save_pc:
-        pcname = output.replace(".txt", "_pc.ply")
-
     # Call main function
-    main(mesh, source, output, save_pc, soma_mesh)
+    main(mesh, source, output, save_pc, soma_mesh, cache_swc=args.cache_swc == 1)
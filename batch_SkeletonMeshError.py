@@ -2,7 +2,8 @@ import argparse
 import os
 from SkeletonMeshError import main
 import sqlite3
-import pandas as pd
+from multiprocessing import Pool
+from src.mesh_io import is_mesh_file
 
 
 def parse_data(file):
@@ -17,6 +18,33 @@ def parse_data(file):
     return data
 
 
+def write_summary(direc, data):
+    """Function to save summary data in the directory in a single transaction"""
+    columns = []
+    for row in data:
+        columns += [key for key in row if key not in columns]
+    names = ", ".join(f'"{key}"' for key in columns)
+    values = [tuple(row.get(key) for key in columns) for row in data]
+
+    conn = sqlite3.connect(os.path.join(direc, "summary.db"), isolation_level=None)
+    try:
+        conn.execute("BEGIN")
+        conn.execute("DROP TABLE IF EXISTS summary")
+        if columns:
+            conn.execute(f"CREATE TABLE summary ({names})")
+            conn.executemany(
+                f"INSERT INTO summary VALUES ({', '.join('?' * len(columns))})",
+                values,
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return None
+
+
 def gather_data(direc):
     """Function to obtain summary data from a directory of log files"""
 
@@ -24,24 +52,51 @@ def gather_data(direc):
     files = os.listdir(direc)
     data = []
     for file in files:
-        if not (file.endswith(".db")):
+        if file.endswith(".txt"):
             # Store in the data from this log file
             data.append(parse_data(os.path.join(direc, file)))
 
-    # Create DataFrame and save summary in the directory
-    data = pd.DataFrame(data)
-    conn = sqlite3.connect(os.path.join(direc, "summary.db"))
-    data.to_sql("summary", conn, if_exists="replace", index=False)
+    # Save summary in the directory
+    write_summary(direc, data)
     return data
 
 
 def read_gathered_data(direc):
     # Read summary log file in a log file directory
+    import pandas as pd
+
     conn = sqlite3.connect(os.path.join(direc, "summary.db"))
     data = pd.read_sql_query("SELECT * FROM summary", conn)
     return data
 
 
+def score_cell(source, jobs, kwargs):
+    """Compute the Skeleton to Mesh error of every mesh of a Swc file, sharing its point cloud.
+
+    Args:
+        source (string): path to Swc file
+        jobs (list): pairs of mesh and output paths.
+        kwargs (dict): keyword arguments of main.
+
+    Returns:
+        results (list): mesh, output, summary data and error message of every mesh.
+    """
+    results = []
+    for mesh, output in jobs:
+        try:
+            print(f"Running {mesh}")
+            dist = main(mesh, source, output, **kwargs)
+            results.append((mesh, output, dist, None))
+        except Exception as e:
+            print(f"Error with {mesh}: {e!r}")
+            results.append((mesh, output, None, repr(e)))
+    return results
+
+
+def _score_cell(args):
+    return score_cell(*args)
+
+
 if __name__ == "__main__":
     description = (
         """ Compute the Skeleton to Mesh error for all meshes in a directory"""
@@ -70,10 +125,27 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "--create_summary",
-        int,
+        type=int,
         default=0,
         help="Flag to store a DataFrame with all summary statistics for each cell",
     )
+    parser.add_argument(
+        "--workers",
+        help="Number of cells scored in parallel. Set to 0 to use all cores.",
+        default=1,
+        type=int,
+    )
+    parser.add_argument(
+        "--cache_dir",
+        help="Directory caching the point clouds of the Swc files. Defaults to output_dir/point_clouds.",
+        default=None,
+    )
+    parser.add_argument(
+        "--cache_swc",
+        help="Flag to cache the read swc files and reuse them in later runs",
+        default=0,
+        type=int,
+    )
     # Parse args
     args = parser.parse_args()
 
@@ -85,38 +157,57 @@ if __name__ == "__main__":
     remove_suffix = args.remove_suffix
     add_suffix = args.add_suffix
     create_summary = args.create_summary
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+    cache_dir = args.cache_dir
+    if cache_dir is None:
+        cache_dir = os.path.join(output_direc, "point_clouds")
     if not (os.path.isdir(output_direc)):
         os.mkdir(output_direc)
 
     # Extract list of Swc files in input directory
-    files = [
-        file
-        for file in os.listdir(direc)
-        if file.endswith(".ply") or file.endswith(".obj")
-    ]
-
-    # Iterate through mesh files
-    for i, file in enumerate(files):
+    files = [file for file in os.listdir(direc) if is_mesh_file(file)]
+
+    # Group mesh files by Swc file, so each point cloud is made once
+    cells = {}
+    data = []
+    for file in files:
         mesh = f"{direc}/{file}"
-        if file.endswith(".ply"):
-            ext = ".ply"
-        if file.endswith(".obj"):
-            ext = ".obj"
+        ext = os.path.splitext(file)[1]
         source = file.replace(f"{remove_suffix}{ext}", f"{add_suffix}.swc")
         source = f"{swc_direc}/{source}"
         output = file.replace(ext, ".txt")
         output = f"{output_direc}/{output}"
-        try:
-            if os.path.isfile(output):
-                print(f"{file} already completed")
-            else:
-                print(f"Running {mesh}: {i}/{len(files)}")
-                main(mesh, source, output, save_pc)
-        except:
-            print(f"Error with {file}")
+        if os.path.isfile(output):
+            print(f"{file} already completed")
+            if create_summary:
+                data.append(parse_data(output))
+        else:
+            cells.setdefault(source, []).append((mesh, output))
+    kwargs = {
+        "save_pc": save_pc,
+        "cache_dir": cache_dir,
+        "cache_swc": args.cache_swc == 1,
+    }
+    tasks = [(source, jobs, kwargs) for source, jobs in cells.items()]
+    print(f"Scoring {sum(map(len, cells.values()))} meshes of {len(cells)} cells")
+
+    # Score cells in parallel, each in its own process
+    if workers > 1 and len(tasks) > 1:
+        with Pool(min(workers, len(tasks))) as pool:
+            results = [
+                r for cell in pool.imap_unordered(_score_cell, tasks) for r in cell
+            ]
+    else:
+        results = [r for task in tasks for r in score_cell(*task)]
+
+    for mesh, output, dist, error in results:
+        if create_summary and error is None:
+            data.append(
+                {"mesh": output, **{key: float(value) for key, value in dist.items()}}
+            )
 
     # Create summary file
     if create_summary:
         summary_file = os.path.join(output_direc, "summary.db")
         print(f"Analysis complete, creating summary in {summary_file}")
-        gather_data(output_direc)
+        write_summary(output_direc, data)
@@ -1,7 +1,143 @@
 import argparse
 import os
+import multiprocessing
+from multiprocessing.connection import wait
 from mesh_swc import main
 from src.get_mesh_stats import mesh_stats
+from src.mesh_io import mesh_extension, is_container, update_metadata
+
+
+def mesh_file(
+    file,
+    output_dir,
+    alpha_fraction,
+    min_faces,
+    dfaces,
+    simplify,
+    Delta,
+    tetgen_args,
+    save_alpha_mesh,
+    store_data,
+    mesh_format="ply",
+    reuse_alpha=False,
+    cache_swc=False,
+):
+    """Mesh a single Swc file into output_dir and store its meshing data.
+
+    The data is written into a _log.txt file, or into the metadata of .npz and .h5 meshes.
+    """
+    # Meshing a file
+    print(f"Meshing {file}")
+
+    # Main meshing function
+    swc, timings, ms, mesh_name, ms_alpha = main(
+        file,
+        output_dir,
+        alpha_fraction,
+        min_faces,
+        dfaces,
+        simplify,
+        Delta,
+        tetgen_args,
+        save_alpha_mesh,
+        mesh_format=mesh_format,
+        reuse_alpha=reuse_alpha,
+        cache_swc=cache_swc,
+    )
+    output_file = mesh_name
+
+    # Store meshing timing data
+    if store_data:
+        print(mesh_name)
+        data = mesh_stats(swc, ms, ms_alpha, mesh_name)
+        if is_container(output_file):
+            update_metadata(output_file, data)
+        else:
+            with open(os.path.splitext(output_file)[0] + "_log.txt", "w") as f:
+                for key in data.keys():
+                    f.write(f"{key}:{data[key]}\n")
+        print(f"Saved data for {file}")
+    return mesh_name
+
+
+def record_failure(output_dir, file, error):
+    """Report a failed Swc file and append it to Failed_meshes.txt."""
+    print(f"Error with {file}:\n {error}")
+    with open(f"{output_dir}/Failed_meshes.txt", "a") as f:
+        f.write(f"Error with {file}:\n {error}\n")
+
+
+# Longest error message sent back by a worker process
+MAX_ERROR_LENGTH = 2000
+
+
+def estimate_cost(file):
+    """Estimate the cost of meshing a Swc file by its number of nodes."""
+    with open(file, "r") as f:
+        return sum(1 for line in f if line.lstrip()[:1].isdigit())
+
+
+def _mesh_worker(file, conn, mesh_kwargs):
+    """Mesh one file in a worker process, sending back None or the error."""
+    try:
+        mesh_file(file, **mesh_kwargs)
+        conn.send(None)
+    except Exception as e:
+        conn.send(repr(e)[:MAX_ERROR_LENGTH])
+    conn.close()
+
+
+def _receive(conn):
+    """Receive the result of a worker process, None if it exited without sending one."""
+    try:
+        return conn.recv()
+    except EOFError:
+        return None
+
+
+def mesh_files_parallel(files, workers, mesh_kwargs):
+    """Mesh Swc files across worker processes.
+
+    Each file is meshed in its own process, so a crash only loses that cell. The largest cells
+    are started first and an idle worker always takes the next largest remaining cell, so the
+    slowest cells do not end up running alone at the end of the batch.
+    """
+    output_dir = mesh_kwargs["output_dir"]
+    pending = sorted(files, key=estimate_cost, reverse=True)
+    running = {}
+    errors = {}
+    while pending or running:
+        # Start the largest remaining cells on idle workers
+        while pending and len(running) < workers:
+            file = pending.pop(0)
+            recv, send = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=_mesh_worker, args=(file, send, mesh_kwargs)
+            )
+            process.start()
+            send.close()
+            running[process.sentinel] = (process, file, recv)
+
+        # Read results as they are sent, so that no worker blocks on a full pipe
+        receiving = [recv for _, _, recv in running.values() if recv not in errors]
+        ready = wait(list(running.keys()) + receiving)
+        for recv in receiving:
+            if recv in ready:
+                errors[recv] = _receive(recv)
+
+        # Collect finished cells
+        for sentinel in [sentinel for sentinel in running if sentinel in ready]:
+            process, file, recv = running.pop(sentinel)
+            if recv not in errors:
+                errors[recv] = _receive(recv) if recv.poll() else None
+            error = errors.pop(recv)
+            process.join()
+            if error is None and process.exitcode != 0:
+                error = f"Worker exited with code {process.exitcode}"
+            recv.close()
+            if error is not None:
+                record_failure(output_dir, file, error)
+    return None
 
 
 if __name__ == "__main__":
@@ -46,6 +182,31 @@ if __name__ == "__main__":
         help="Flag to save alpha wrapping mesh",
         default=0,
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of cells meshed in parallel. Set to 0 to use all cores",
+    )
+    parser.add_argument(
+        "--mesh_format",
+        type=str,
+        choices=["ply", "ascii_ply", "npz", "h5"],
+        default="ply",
+        help="Format of the saved meshes: binary PLY, ASCII PLY or a .npz or .h5 container",
+    )
+    parser.add_argument(
+        "--reuse_alpha",
+        type=int,
+        default=0,
+        help="Flag to cache the alpha wrapping meshes and reuse them in later runs",
+    )
+    parser.add_argument(
+        "--cache_swc",
+        type=int,
+        default=0,
+        help="Flag to cache the processed swc files and reuse them in later runs",
+    )
     # Parse args
     args = parser.parse_args()
 
@@ -61,6 +222,10 @@ if __name__ == "__main__":
     save_alpha_mesh = args.save_alpha_mesh == 1
     Delta = args.Delta
     output_dir = args.output_dir
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+    mesh_format = args.mesh_format
+    reuse_alpha = args.reuse_alpha == 1
+    cache_swc = args.cache_swc == 1
 
     # Extract list of Swc files in input directory
     files = [
@@ -74,52 +239,40 @@ if __name__ == "__main__":
         print(f"Creating {output_dir}")
         os.mkdir(output_dir)
 
-    # Begin iterating through cells
+    # Only mesh if a previous mesh not available
+    mesh_kwargs = {
+        "output_dir": output_dir,
+        "alpha_fraction": alpha_fraction,
+        "min_faces": min_faces,
+        "dfaces": dfaces,
+        "simplify": simplify,
+        "Delta": Delta,
+        "tetgen_args": tetgen_args,
+        "save_alpha_mesh": save_alpha_mesh,
+        "store_data": store_data,
+        "mesh_format": mesh_format,
+        "reuse_alpha": reuse_alpha,
+        "cache_swc": cache_swc,
+    }
+    remaining = []
     for file in files:
-        try:
-            # Meshing a file
-            print(f"Meshing {file}")
-
-            # Get name of output file
-            output_file = os.path.join(
-                output_dir, os.path.basename(file).replace(".swc", ".ply")
-            )
+        # Get name of output file
+        output_file = os.path.join(
+            output_dir,
+            os.path.basename(file).replace(".swc", mesh_extension(mesh_format)),
+        )
+        if os.path.isfile(output_file):
+            print(f"{output_file} already exists, skipping {file}")
+        else:
+            remaining.append(file)
 
-            # Only mesh if a previous mesh not available
-            if not (os.path.isfile(output_file)):
-                # Main meshing function
-                swc, timings, ms, mesh_name, ms_alpha = main(
-                    file,
-                    output_dir,
-                    alpha_fraction,
-                    min_faces,
-                    dfaces,
-                    simplify,
-                    Delta,
-                    tetgen_args,
-                    save_alpha_mesh,
-                )
-                output_file = mesh_name
-
-                # Store meshing timing data
-                if store_data:
-                    print(mesh_name)
-                    data = mesh_stats(swc, ms, ms_alpha, mesh_name)
-                    with open(output_file.replace(".ply", "_log.txt"), "w") as f:
-                        for key in data.keys():
-                            f.write(f"{key}:{data[key]}\n")
-                    print(f"Saved data for {file}")
-            else:
-                print(f"{output_file} already exists, skipping {file}")
-        except (RuntimeError, ValueError) as e:
-            print(f"Error with {file}:\n {repr(e)}")
-            with open(f"{output_dir}/Failed_meshes.txt", "a") as f:
-                f.write(f"Error with {file}:\n {repr(e)}\n")
-
-        # Clear memory
-        swc = None
-        timings = None
-        ms = None
-        mesh_name = None
-        ms_alpha = None
-        data = None
+    if workers > 1:
+        # Mesh cells in parallel, one process per cell
+        mesh_files_parallel(remaining, workers, mesh_kwargs)
+    else:
+        # Begin iterating through cells
+        for file in remaining:
+            try:
+                mesh_file(file, **mesh_kwargs)
+            except Exception as e:
+                record_failure(output_dir, file, repr(e)[:MAX_ERROR_LENGTH])
@@ -4,6 +4,7 @@ import sqlite3
 import pandas as pd   
 import argparse
 import pymeshlab as mlab
+from src.mesh_io import is_mesh_file, is_container, load_metadata
 
 def remove_chars(value):
     for c  in ['\n','[',']']:
@@ -17,9 +18,13 @@ types['face_number'] = int
 types['alpha_vertex_number'] = int
 types['alpha_face_number'] = int
 types['cleaned_swc_nodes'] = int
+types['simplify_attempts'] = int
+types['emergency_attempts'] = int
+types['swc_cache_hit'] = int
+types['alpha_cache_hit'] = int
 for key in ['surface_area','volume','alpha_surface_area','alpha_volume','extract_swc','reorder_swc',
             'process_swc','initialise_branches','initialising_individual_meshes','merging_individual_meshes',
-            'alpha_wrap','simplify_mesh']:
+            'alpha_wrap','simplify_mesh','peak_memory_mb','Delta','alpha_fraction','swc_cache','alpha_cache']:
     types[key] = float
 for key in ['mesh_quality','tetgen']:
     types[key] = str
@@ -39,19 +44,27 @@ if __name__=='__main__':
     output=args.output
     SME_dir = args.SME_dir
     
-    mesh_files=[os.path.abspath(os.path.join(input_dir,file)) for file in os.listdir(input_dir) if file.endswith('.ply')]
+    mesh_files=[os.path.abspath(os.path.join(input_dir,file)) for file in os.listdir(input_dir) if is_mesh_file(file)]
     log_files=[os.path.abspath(os.path.join(input_dir,file)) for file in os.listdir(input_dir) if file.endswith('_log.txt')]
+
+    # Meshes saved in .npz or .h5 containers store their meshing data as metadata
+    container_data = [load_metadata(file) for file in mesh_files if is_container(file)]
+    container_data = [metadata for metadata in container_data if 'surface_area' in metadata]
     
     data = []
     ms = mlab.MeshSet()
-    for log in log_files:
+    for log in log_files + container_data:
         cell_data = {}
         
         # Get timings and mesh information
-        with open(log,'r') as f:
-            for line in f:
-                key,values = line.split(':')
-                cell_data[key] = types[key](remove_chars(values))
+        if isinstance(log,dict):
+            for key,values in log.items():
+                cell_data[key] = types.get(key,str)(remove_chars(str(values)))
+        else:
+            with open(log,'r') as f:
+                for line in f:
+                    key,values = line.split(':')
+                    cell_data[key] = types.get(key,str)(remove_chars(values))
         
         # Get Skeleton Mesh Error
         if SME_dir is not None:
@@ -67,7 +80,10 @@ if __name__=='__main__':
 
         cell_data['SME'] = SME
 
-        cell_data['total_time'] = cell_data['extract_swc'] + cell_data['reorder_swc'] +cell_data['process_swc'] +cell_data['initialise_branches'] +cell_data['initialising_individual_meshes'] +cell_data['merging_individual_meshes'] +cell_data['alpha_wrap'] +cell_data['simplify_mesh']
+        # Steps skipped by a run, such as swc processing loaded from the cache, take no time
+        stages = ['swc_cache','extract_swc','reorder_swc','process_swc','initialise_branches','initialising_individual_meshes',
+                  'merging_individual_meshes','alpha_cache','alpha_wrap','simplify_mesh']
+        cell_data['total_time'] = sum(cell_data.get(key,0.0) for key in stages)
         print(cell_data)
 
         data.append(cell_data)
@@ -76,4 +92,4 @@ if __name__=='__main__':
     conn = sqlite3.connect(output)
     data.to_sql('Alpha_Mesh_Swc',conn,if_exists='replace')
 
-    print(f'{len(mesh_files)} produced out of {len(log_files)} inputs.')
\ No newline at end of file
+    print(f'{len(mesh_files)} produced out of {len(log_files)+len(container_data)} inputs.')
\ No newline at end of file
@@ -3,6 +3,7 @@ import argparse
 import time
 import os
 import pymeshlab as mlab
+from src.mesh_io import save_mesh, mesh_extension
 
 if __name__ == "__main__":
     description = """Reads swc file and separate soma file and produces a coarse watertight surface mesh
@@ -30,6 +31,19 @@ if __name__ == "__main__":
         "--segment_meshes", type=int, help="Flag to mesh separate segments", default=0
     )
     parser.add_argument("--soma_ext", help="Extension of soma file", default=".wrl")
+    parser.add_argument(
+        "--mesh_format",
+        type=str,
+        choices=["ply", "ascii_ply", "npz", "h5"],
+        default="ply",
+        help="Format of the saved meshes: binary PLY, ASCII PLY or a .npz or .h5 container",
+    )
+    parser.add_argument(
+        "--cache_swc",
+        type=int,
+        default=0,
+        help="Flag to cache the processed swc file and reuse it in later runs",
+    )
 
     # Parse args
     args = parser.parse_args()
@@ -39,15 +53,22 @@ if __name__ == "__main__":
     # Get file paths
     dendrite_file = ".".join([args.name.replace("\r", ""), "swc"])
     cellname = os.path.basename(dendrite_file)
-    output = os.path.join(args.output_dir, cellname.replace(".swc", ".ply"))
+    ext = mesh_extension(args.mesh_format)
+    output = os.path.join(args.output_dir, cellname.replace(".swc", ext))
     log = args.log
-    temp_dir_name = output.replace(".ply", "")
+    temp_dir_name = os.path.splitext(output)[0]
 
     # Create mesh for processes
     print(f"Loading {dendrite_file}")
     start = time.time()
     # Load Swc
-    swc = Swc(dendrite_file, process=True, Delta=args.Delta, delta=args.Delta / 2)
+    swc = Swc(
+        dendrite_file,
+        process=True,
+        Delta=args.Delta,
+        delta=args.Delta / 2,
+        cache=args.cache_swc == 1,
+    )
 
     # Store simplification parameters
     if args.simplify == 1:
@@ -87,12 +108,12 @@ if __name__ == "__main__":
             )
 
         # Save mesh output
-        ms.save_current_mesh(output, binary=False)
+        save_mesh(ms, output, args.mesh_format)
         print(f"Saved to {output}")
 
         # Write log output
         if log is not None:
-            with open(output.replace(".ply", ".txt"), "w") as f:
+            with open(temp_dir_name + ".txt", "w") as f:
                 f.write(f"{time.time()-start:.2f}")
     else:
         # Get separate dendrite and soma meshes
@@ -118,17 +139,15 @@ if __name__ == "__main__":
                     ms_d, dfaces / 3, r_min, min_faces / 3, temp_dir_name=temp_dir_name
                 )
             # Save mesh
-            ms_d.save_current_mesh(
-                output.replace(".ply", f"_process_{i+1}.ply"), binary=False
-            )
-            print("Saved to " + output.replace(".ply", f"_process_{i+1}.ply"))
+            save_mesh(ms_d, temp_dir_name + f"_process_{i+1}{ext}", args.mesh_format)
+            print("Saved to " + temp_dir_name + f"_process_{i+1}{ext}")
 
             # Clear working meshset
             ms_dendrites.delete_current_mesh()
 
             # Write log output
             if log is not None:
-                with open(output.replace(".ply", f"_process_{i+1}.txt"), "w") as f:
+                with open(temp_dir_name + f"_process_{i+1}.txt", "w") as f:
                     f.write(f"Meshing time : {meshing_time}")
                     if args.simplify == 1:
                         f.write(f"Simplifying time : {time.time()-start_simplify:.2f}")
@@ -152,14 +171,14 @@ if __name__ == "__main__":
             )
 
         # Save mesh
-        ms_soma.save_current_mesh(output.replace(".ply", "_soma.ply"), binary=False)
+        save_mesh(ms_soma, temp_dir_name + f"_soma{ext}", args.mesh_format)
 
         # Write log output
         if log is not None:
-            with open(output.replace(".ply", "_soma.txt"), "w") as f:
+            with open(temp_dir_name + "_soma.txt", "w") as f:
                 f.write(f"Meshing time : {meshing_time}")
                 if args.simplify == 1:
                     f.write(f"Simplifying time : {time.time()-start_simplify:.2f}")
-        print(f"Saved to" + output.replace(".ply", "_soma.ply"))
+        print(f"Saved to" + temp_dir_name + f"_soma{ext}")
 
     print(f"Total Elapsed time = {time.time()-start:.2f}")
@@ -2,6 +2,8 @@ from src import Swc
 import argparse
 import time
 from src.pytetgen import call_tetgen
+from src.mesh_io import save_mesh, TETGEN_SUFFIX
+import os
 
 
 def main(
@@ -15,6 +17,12 @@ def main(
     tetgen_args=None,
     save_alpha_mesh=False,
     save_clean_swc=False,
+    workers=1,
+    check_tetgen=False,
+    search="linear",
+    mesh_format="ply",
+    reuse_alpha=False,
+    cache_swc=False,
 ):
     """Create watertight surface mesh from input Swc file.
 
@@ -32,6 +40,12 @@ def main(
         tetgen_args (string): optional tetgen parameters to call tetgen
         save_alpha_mesh (bool): flag to save the alpha-wrapped mesh
         save_clean_swc (bool): flag to save processed Swc
+        workers (int): number of processes building the branch meshes and for parallel search, 0 uses all cores
+        check_tetgen (bool): flag to cross-check self-intersections with TetGen
+        search (string): strategy to search the number of faces for simplification stage
+        mesh_format (string): format of the saved mesh, "ply" (binary), "ascii_ply", "npz" or "h5"
+        reuse_alpha (bool): flag to load the alpha-wrapped mesh from the cache if it was computed before
+        cache_swc (bool): flag to load the processed Swc from the cache if it was processed before
 
     Returns:
         swc (Swc): Swc containing cell data
@@ -44,7 +58,7 @@ def main(
     start = time.time()
 
     # Load and process the Swc file
-    swc = Swc(file, True, Delta, Delta / 2)
+    swc = Swc(file, True, Delta, Delta / 2, cache=cache_swc)
 
     # store clean swc file
     if save_clean_swc:
@@ -58,6 +72,11 @@ def main(
         dfaces=dfaces,
         alpha_fraction=alpha_fraction,
         save_alpha_mesh=save_alpha_mesh,
+        workers=workers,
+        check_tetgen=check_tetgen,
+        search=search,
+        mesh_format=mesh_format,
+        alpha_cache=reuse_alpha,
     )
 
     # Extract timings
@@ -66,7 +85,12 @@ def main(
     # Run Tetgen if desired
     if tetgen_args is not None:
         start_tet = time.time()
-        call_tetgen(mesh_name, tetgen_args)
+        # TetGen only reads ASCII PLY files
+        tet_name = mesh_name
+        if mesh_format != "ascii_ply":
+            tet_name = os.path.splitext(mesh_name)[0] + TETGEN_SUFFIX
+            save_mesh(ms, tet_name, "ascii_ply")
+        call_tetgen(tet_name, tetgen_args)
         timings["tetgen"] = time.time() - start_tet
 
     print(f"Completed {mesh_name}.")
@@ -117,6 +141,50 @@ if __name__ == "__main__":
         default=0,
     )
 
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of processes building the branch meshes and for parallel search. Set to 0 to use all cores.",
+        default=1,
+    )
+
+    parser.add_argument(
+        "--check_tetgen",
+        type=int,
+        help="Flag to cross-check self-intersections with TetGen",
+        default=0,
+    )
+
+    parser.add_argument(
+        "--search",
+        type=str,
+        choices=["linear", "bisection", "galloping", "parallel"],
+        help="Strategy to search the number of faces when simplifying",
+        default="linear",
+    )
+
+    parser.add_argument(
+        "--mesh_format",
+        type=str,
+        choices=["ply", "ascii_ply", "npz", "h5"],
+        help="Format of the saved mesh: binary PLY, ASCII PLY or a .npz or .h5 container",
+        default="ply",
+    )
+
+    parser.add_argument(
+        "--reuse_alpha",
+        type=int,
+        help="Flag to cache the alpha wrapping mesh and reuse it in later runs",
+        default=0,
+    )
+
+    parser.add_argument(
+        "--cache_swc",
+        type=int,
+        help="Flag to cache the processed swc file and reuse it in later runs",
+        default=0,
+    )
+
     # Parse args
     args = parser.parse_args()
 
@@ -135,6 +203,12 @@ if __name__ == "__main__":
         args.Delta,
         args.tetgen_args,
         save_alpha_mesh,
+        workers=args.workers,
+        check_tetgen=args.check_tetgen == 1,
+        search=args.search,
+        mesh_format=args.mesh_format,
+        reuse_alpha=args.reuse_alpha == 1,
+        cache_swc=args.cache_swc == 1,
     )
 
     # Perform any further analysis needed here.
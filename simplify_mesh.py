@@ -3,6 +3,7 @@ import argparse
 import time
 import pymeshlab as mlab
 import os
+from src.mesh_io import save_mesh, load_mesh, mesh_extension
 
 if __name__ == "__main__":
     description = """Takes refined watertight mesh and outputs a coarse watertight surface mesh
@@ -24,6 +25,19 @@ if __name__ == "__main__":
         help="Amount to change target number of faces by if failure.",
         default=None,
     )
+    parser.add_argument(
+        "--mesh_format",
+        type=str,
+        choices=["ply", "ascii_ply", "npz", "h5"],
+        default="ply",
+        help="Format of the simplified mesh: binary PLY, ASCII PLY or a .npz or .h5 container",
+    )
+    parser.add_argument(
+        "--cache_swc",
+        type=int,
+        default=0,
+        help="Flag to cache the read swc file and reuse it in later runs",
+    )
 
     # Parse args
     args = parser.parse_args()
@@ -33,15 +47,20 @@ if __name__ == "__main__":
     meshfile = args.meshfile
     output_dir = args.output_dir
     temp_dir = os.path.join(output_dir, "temp")
-    meshname = output_dir + "/" + os.path.basename(meshfile)
+    meshname = (
+        output_dir
+        + "/"
+        + os.path.splitext(os.path.basename(meshfile))[0]
+        + mesh_extension(args.mesh_format)
+    )
 
     start = time.time()
 
     # Load Swc file and mesh
-    swc = Swc(file, False)
+    swc = Swc(file, False, cache=args.cache_swc == 1)
     ms = mlab.MeshSet()
     print("Loading mesh")
-    ms.load_new_mesh(meshfile)
+    load_mesh(meshfile, ms)
 
     # Begin simplification
     print("Beginning simplfication")
@@ -49,5 +68,5 @@ if __name__ == "__main__":
     print("Simplification complete")
 
     # Save output mesh
-    ms.save_current_mesh(meshname, binary=False)
+    save_mesh(ms, meshname, args.mesh_format)
     print(f"Total Elapsed time = {time.time()-start:.2f}")
@@ -6,6 +6,7 @@ from os.path import join, abspath, basename, isfile
 import warnings
 from src import Swc
 import argparse
+from src.mesh_io import save_mesh, load_mesh, mesh_extension, is_mesh_file
 
 if __name__ == "__main__":
     description = """Apply simplification proceedure to an input directory of meshes.
@@ -19,6 +20,19 @@ if __name__ == "__main__":
     parser.add_argument("input_dir", help="Input mesh directory.")
     parser.add_argument("source_dir", help="Input SWC directory.")
     parser.add_argument("output_dir", help="Output simplified mesh files.")
+    parser.add_argument(
+        "--mesh_format",
+        type=str,
+        choices=["ply", "ascii_ply", "npz", "h5"],
+        default="ply",
+        help="Format of the simplified meshes: binary PLY, ASCII PLY or a .npz or .h5 container",
+    )
+    parser.add_argument(
+        "--cache_swc",
+        type=int,
+        default=0,
+        help="Flag to cache the processed swc files and reuse them in later runs",
+    )
 
     # Parse args
     args = parser.parse_args()
@@ -27,12 +41,14 @@ if __name__ == "__main__":
     input_dir = args.input_dir
     output_dir = args.output_dir
     source_dir = args.source_dir
+    mesh_format = args.mesh_format
+    cache_swc = args.cache_swc == 1
 
     # Extract list of mesh files in input directory
     files = [
         abspath(join(input_dir, file))
         for file in os.listdir(input_dir)
-        if file.endswith(".ply")
+        if is_mesh_file(file)
     ]
 
     # Create output directory if it does not exist already
@@ -46,24 +62,24 @@ if __name__ == "__main__":
         print(f"Processing {i+1}/{nfiles}")
 
         # Get file names
-        filename = basename(file)
-        log_file = join(output_dir, filename.replace(".ply", "_simp_log.txt"))
-        output_file = join(output_dir, filename)
+        cellname = os.path.splitext(basename(file))[0]
+        log_file = join(output_dir, cellname + "_simp_log.txt")
+        output_file = join(output_dir, cellname + mesh_extension(mesh_format))
 
         # Only mesh if a previous mesh not available
         if not (isfile(output_file)):
             start = time.time()
             # Load mesh
-            ms.load_new_mesh(file)
+            load_mesh(file, ms)
             # Get start number of vertices
             start_vertices = ms.current_mesh().vertex_number()
 
             # Only try to simplify if original mesh is valid
-            if is_watertight(ms, name=file.replace(".ply", "")):
+            if is_watertight(ms, name=os.path.splitext(file)[0]):
 
                 # REPLACE AS DESIRED.
                 # The parameters for simplification algorithm
-                swc = Swc(join(source_dir, filename.replace(".ply", ".swc")))
+                swc = Swc(join(source_dir, cellname + ".swc"), cache=cache_swc)
                 total_length = swc.get_length()
                 dfaces = int(total_length * 8)
                 min_faces = int(total_length * 2)
@@ -75,7 +91,7 @@ if __name__ == "__main__":
                     dfaces=dfaces,
                     r_min=r_min,
                     min_faces=min_faces,
-                    temp_dir_name=output_file.replace(".ply", ""),
+                    temp_dir_name=os.path.splitext(output_file)[0],
                 )
 
                 print(f"Elapsed time = {time.time() - start:.1f}")
@@ -87,7 +103,7 @@ if __name__ == "__main__":
                             f"Old_vertices:{start_vertices}\nNew_vertices:{ms.current_mesh().vertex_number()}\nTime:{time.time() - start}"
                         )
 
-                    ms.save_current_mesh(output_file, binary=False)
+                    save_mesh(ms, output_file, mesh_format)
                 else:
                     print(
                         f"ERROR\n\n\nOld_vertices:{start_vertices}\nNew_vertices:{ms.current_mesh().vertex_number()}"
@@ -0,0 +1,622 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+def _spread_bits(x):
+    """Spread the lowest 21 bits of x so that there are two zero bits between each of them."""
+    x = x & np.uint64(0x1FFFFF)
+    x = (x | (x << np.uint64(32))) & np.uint64(0x1F00000000FFFF)
+    x = (x | (x << np.uint64(16))) & np.uint64(0x1F0000FF0000FF)
+    x = (x | (x << np.uint64(8))) & np.uint64(0x100F00F00F00F00F)
+    x = (x | (x << np.uint64(4))) & np.uint64(0x10C30C30C30C30C3)
+    x = (x | (x << np.uint64(2))) & np.uint64(0x1249249249249249)
+    return x
+
+
+def morton_codes(points):
+    """Computes the 63 bit Morton codes of points, quantised over their bounding box.
+    Args:
+        points: (N,3) array of points.
+    Returns:
+        codes: (N,) array of unsigned intergers.
+    """
+    lo = points.min(axis=0)
+    span = max(np.ptp(points, axis=0).max(), np.finfo(float).tiny)
+    q = ((points - lo) / span * (2**21 - 1)).astype(np.uint64)
+    return (
+        (_spread_bits(q[:, 0]) << np.uint64(2))
+        | (_spread_bits(q[:, 1]) << np.uint64(1))
+        | _spread_bits(q[:, 2])
+    )
+
+
+def _boxes_overlap(lo_a, hi_a, lo_b, hi_b):
+    """Checks which pairs of axis aligned boxes overlap."""
+    return np.all(lo_a <= hi_b, axis=1) & np.all(lo_b <= hi_a, axis=1)
+
+
+def overlapping_boxes(boxes, chunk_size=10000):
+    """Finds the pairs of axis aligned boxes whose interiors overlap, by sorting and sweeping along x.
+
+    Boxes touching along a face, and empty boxes with infinite corners, do not overlap.
+
+    Args:
+        boxes: (n,6) array of boxes (xmin,ymin,zmin,xmax,ymax,zmax).
+        chunk_size: (int) number of boxes swept at once, to bound memory.
+    Returns:
+        pairs: (K,2) array of pairs i<j of overlapping boxes, in lexicographic order.
+    """
+    lo = boxes[:, :3]
+    hi = boxes[:, 3:]
+    n = len(boxes)
+    order = np.argsort(lo[:, 0], kind="stable")
+    lo_x = lo[order, 0]
+
+    # The boxes after k in the sorted order which start before box k ends
+    end = np.searchsorted(lo_x, hi[order, 0], side="left")
+    count = np.maximum(end - np.arange(n) - 1, 0)
+    offsets = np.concatenate(([0], np.cumsum(count)))
+
+    pairs = [np.zeros((0, 2), dtype=int)]
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        k = np.repeat(np.arange(start, stop), count[start:stop])
+        j = (
+            np.arange(offsets[start], offsets[stop])
+            - np.repeat(offsets[start:stop], count[start:stop])
+            + k
+            + 1
+        )
+        a, b = order[k], order[j]
+        keep = np.all(lo[a] < hi[b], axis=1) & np.all(lo[b] < hi[a], axis=1)
+        pairs.append(np.stack((a[keep], b[keep]), axis=1))
+    pairs = np.sort(np.vstack(pairs), axis=1)
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+
+def _plane_side(tri, points):
+    """Signed distances, scaled by twice the triangle areas, of (K,3,3) points to the planes of (K,3,3) triangles."""
+    normal = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    return np.einsum("ikj,ij->ik", points - tri[:, [0]], normal)
+
+
+def _straddles(d):
+    """Checks which rows of signed distances are not all strictly positive or all strictly negative."""
+    return ~(np.all(d > 0, axis=1) | np.all(d < 0, axis=1))
+
+
+def _snap(x, tol):
+    """Sets values within tol of zero to zero, tol broadcasting against the rows of x."""
+    return np.where(np.abs(x) <= tol, 0.0, x)
+
+
+def _orient2d(a, b, c):
+    """Twice the signed areas of the 2D triangles (a,b,c), for (K,2) arrays of points."""
+    return (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (
+        c[:, 0] - a[:, 0]
+    )
+
+
+def _segments_meet_2d(p, q, a, b, tol):
+    """Checks whether the closed 2D segments pq and ab meet, for (K,2) arrays of end points.
+    Returns:
+        meet: (K,) boolean array.
+        collinear: (K,) boolean array of segments on a common line.
+    """
+    o1 = _snap(_orient2d(p, q, a), tol)
+    o2 = _snap(_orient2d(p, q, b), tol)
+    o3 = _snap(_orient2d(a, b, p), tol)
+    o4 = _snap(_orient2d(a, b, q), tol)
+    collinear = (o1 == 0) & (o2 == 0)
+    # Collinear segments meet when their boxes do
+    boxes = np.all(np.minimum(p, q) <= np.maximum(a, b), axis=1) & np.all(
+        np.minimum(a, b) <= np.maximum(p, q), axis=1
+    )
+    meet = np.where(collinear, boxes, (o1 * o2 <= 0) & (o3 * o4 <= 0))
+    return meet, collinear
+
+
+def _inside_2d(t, p, tol):
+    """Checks whether 2D points p lie in the closed triangles t, for (K,3,2) triangles and (K,2) points."""
+    o = [_snap(_orient2d(t[:, k], t[:, (k + 1) % 3], p), tol) for k in range(0, 3)]
+    return ((o[0] >= 0) & (o[1] >= 0) & (o[2] >= 0)) | (
+        (o[0] <= 0) & (o[1] <= 0) & (o[2] <= 0)
+    )
+
+
+def _coplanar_overlap(ta, tb, fa, fb, normal, tol):
+    """Checks whether coplanar triangles overlap beyond the vertices they share, in the plane
+    of the triangles projected along the largest component of their normals."""
+    axes = np.array([[1, 2], [0, 2], [0, 1]])[np.argmax(np.abs(normal), axis=1)]
+    ta = np.take_along_axis(ta, axes[:, np.newaxis, :], axis=2)
+    tb = np.take_along_axis(tb, axes[:, np.newaxis, :], axis=2)
+    same = fa[:, :, np.newaxis] == fb[:, np.newaxis, :]
+    in_a, in_b = np.any(same, axis=2), np.any(same, axis=1)
+    n_shared = np.sum(in_a, axis=1)
+    overlap = n_shared == 3
+
+    # Triangles sharing an edge overlap when folded onto the same side of the edge
+    for k in range(0, 3):
+        l, m = (k + 1) % 3, (k + 2) % 3
+        edge = (n_shared == 2) & in_a[:, k] & in_a[:, l]
+        if np.any(edge):
+            opposite = tb[np.arange(len(tb)), np.argmin(in_b, axis=1)]
+            side_a = _snap(_orient2d(ta[:, k], ta[:, l], ta[:, m]), tol)
+            side_b = _snap(_orient2d(ta[:, k], ta[:, l], opposite), tol)
+            overlap |= edge & (side_a * side_b > 0)
+
+    # Otherwise they overlap when a vertex of one, other than a shared vertex, lies in the other,
+    # or when their edges meet away from the shared vertices
+    apart = n_shared < 2
+    for k in range(0, 3):
+        overlap |= apart & ~in_a[:, k] & _inside_2d(tb, ta[:, k], tol)
+        overlap |= apart & ~in_b[:, k] & _inside_2d(ta, tb[:, k], tol)
+    for k in range(0, 3):
+        for j in range(0, 3):
+            p, q = ta[:, k], ta[:, (k + 1) % 3]
+            a, b = tb[:, j], tb[:, (j + 1) % 3]
+            meet, collinear = _segments_meet_2d(p, q, a, b, tol)
+            # Edges from a shared vertex only meet elsewhere when they run along each other
+            through_a = in_a[:, k] | in_a[:, (k + 1) % 3]
+            through_b = in_b[:, j] | in_b[:, (j + 1) % 3]
+            both = through_a & through_b & (n_shared == 1)
+            s = np.where(in_a[:, [k]], p, q)
+            along = np.einsum("ij,ij->i", p + q - 2 * s, a + b - 2 * s) > 0
+            overlap |= apart & meet & (~both | (collinear & along))
+    return overlap
+
+
+def _interval_overlap(t1, t2, d1, d2, direction, n_shared, tol):
+    """Checks whether non-coplanar triangles overlap beyond their shared vertex, by intersecting
+    the intervals they cut on the line where their planes meet, as in Moller, A fast triangle-triangle
+    intersection test. Touching intervals are counted as overlapping unless a vertex is shared.
+    """
+    intervals = []
+    for t, d in ((t1, d1), (t2, d2)):
+        x = np.einsum("ikj,ij->ik", t, direction)
+        ends = [np.where(d == 0, x, np.nan)]
+        for k in range(0, 3):
+            l = (k + 1) % 3
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cut = x[:, k] + (x[:, l] - x[:, k]) * d[:, k] / (d[:, k] - d[:, l])
+            ends.append(np.where(d[:, k] * d[:, l] < 0, cut, np.nan)[:, np.newaxis])
+        ends = np.hstack(ends)
+        intervals.append((np.nanmin(ends, axis=1), np.nanmax(ends, axis=1)))
+    (lo1, hi1), (lo2, hi2) = intervals
+    length = np.minimum(hi1, hi2) - np.maximum(lo1, lo2)
+    return np.where(n_shared == 1, length > tol, length >= 0)
+
+
+def triangles_intersect(v, f, pairs, tol=1e-10):
+    """Checks whether pairs of triangles of a mesh intersect, including touching and overlapping triangles.
+
+    Triangles sharing a vertex or an edge only intersect when they overlap elsewhere. Non-coplanar
+    triangles intersect when the intervals they cut on the line where their planes meet overlap.
+    Coplanar triangles intersect when a vertex of one lies in the other or their edges meet. Faces
+    with no area always intersect their neighbours, as TetGen rejects them.
+
+    Args:
+        v: (N,3) array of vertices.
+        f: (M,3) array of faces.
+        pairs: (K,2) array of pairs of faces.
+        tol: (float) tolerance relative to the longest edges of the faces, under which distances
+        and heights of faces are taken as zero.
+    Returns:
+        flag: (K,) boolean array.
+    """
+    fa = f[pairs[:, 0]]
+    fb = f[pairs[:, 1]]
+    ta = v[fa]
+    tb = v[fb]
+    flag = np.zeros(len(pairs), dtype=bool)
+
+    # Squared length of the longest edge of each face
+    ea = ta - np.roll(ta, 1, axis=1)
+    eb = tb - np.roll(tb, 1, axis=1)
+    la = np.max(np.einsum("ikj,ikj->ik", ea, ea), axis=1)
+    lb = np.max(np.einsum("ikj,ikj->ik", eb, eb), axis=1)
+    L = np.sqrt(np.maximum(la, lb))
+
+    # Degenerate faces
+    na = np.cross(ta[:, 1] - ta[:, 0], ta[:, 2] - ta[:, 0])
+    nb = np.cross(tb[:, 1] - tb[:, 0], tb[:, 2] - tb[:, 0])
+    degenerate = (np.linalg.norm(na, axis=1) <= tol * la) | (
+        np.linalg.norm(nb, axis=1) <= tol * lb
+    )
+    flag[degenerate] = True
+
+    # Reject pairs where one triangle lies strictly on one side of the plane of the other, shared
+    # vertices lie on both planes
+    same = fa[:, :, np.newaxis] == fb[:, np.newaxis, :]
+    da = np.where(np.any(same, axis=2), 0.0, _plane_side(tb, ta))
+    db = np.where(np.any(same, axis=1), 0.0, _plane_side(ta, tb))
+    da = _snap(da, (tol * L * np.linalg.norm(nb, axis=1))[:, np.newaxis])
+    db = _snap(db, (tol * L * np.linalg.norm(na, axis=1))[:, np.newaxis])
+    idx = np.flatnonzero(~degenerate & _straddles(da) & _straddles(db))
+    fa, fb, ta, tb, da, db, na, nb, L = (
+        x[idx] for x in (fa, fb, ta, tb, da, db, na, nb, L)
+    )
+    n_shared = np.sum(np.any(fa[:, :, np.newaxis] == fb[:, np.newaxis, :], axis=2), 1)
+
+    # Coplanar triangles
+    coplanar = np.all(da == 0, axis=1) | np.all(db == 0, axis=1)
+    j = np.flatnonzero(coplanar)
+    flag[idx[j]] = _coplanar_overlap(ta[j], tb[j], fa[j], fb[j], na[j], tol * L[j] ** 2)
+
+    # Non-coplanar triangles sharing an edge only meet along it
+    j = np.flatnonzero(~coplanar & (n_shared < 2))
+    direction = np.cross(na[j], nb[j])
+    flag[idx[j]] = _interval_overlap(
+        ta[j],
+        tb[j],
+        da[j],
+        db[j],
+        direction,
+        n_shared[j],
+        tol * L[j] * np.linalg.norm(direction, axis=1),
+    )
+    return flag
+
+
+def closest_points_on_triangles(p, a, b, c):
+    """Finds the closest points on triangles abc to points p, as in Ericson, Real-Time Collision Detection, 5.1.5.
+    Args:
+        p: (K,3) array of points.
+        a,b,c: (K,3) arrays of triangle vertices.
+    Returns:
+        q: (K,3) array of closest points.
+        region: (K,) array of intergers, 0 when q is inside the triangle, 1,2,3 on the edges ab,bc,ca
+        and 4,5,6 at the vertices a,b,c.
+    """
+    dot = lambda x, y: np.einsum("ij,ij->i", x, y)
+    ab, ac = b - a, c - a
+    ap, bp, cp = p - a, p - b, p - c
+    d1, d2 = dot(ab, ap), dot(ac, ap)
+    d3, d4 = dot(ab, bp), dot(ac, bp)
+    d5, d6 = dot(ab, cp), dot(ac, cp)
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    # Voronoi regions of the triangle, the first one found is used
+    conditions = [
+        (d1 <= 0) & (d2 <= 0),
+        (d3 >= 0) & (d4 <= d3),
+        (vc <= 0) & (d1 >= 0) & (d3 <= 0),
+        (d6 >= 0) & (d5 <= d6),
+        (vb <= 0) & (d2 >= 0) & (d6 <= 0),
+        (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0),
+    ]
+    region = np.select(conditions, [4, 5, 1, 6, 3, 2], default=0)
+
+    # Barycentric coordinates (1-v-w,v,w) of the closest points
+    with np.errstate(divide="ignore", invalid="ignore"):
+        v = np.select(
+            [region == 0, region == 1, region == 2, region == 5],
+            [
+                vb / (va + vb + vc),
+                d1 / (d1 - d3),
+                1 - (d4 - d3) / ((d4 - d3) + (d5 - d6)),
+                1.0,
+            ],
+            default=0.0,
+        )
+        w = np.select(
+            [region == 0, region == 2, region == 3, region == 6],
+            [
+                vc / (va + vb + vc),
+                (d4 - d3) / ((d4 - d3) + (d5 - d6)),
+                d2 / (d2 - d6),
+                1.0,
+            ],
+            default=0.0,
+        )
+    q = a + ab * v[:, np.newaxis] + ac * w[:, np.newaxis]
+    return q, region
+
+
+def pseudonormals(v, f):
+    """Angle weighted pseudonormals of the faces, edges and vertices of a mesh.
+
+    The sign of the dot product of p-q with the pseudonormal at the closest point q of a closed mesh
+    to p tells whether p is outside the mesh, see Baerentzen and Aanaes, Signed distance computation
+    using the angle weighted pseudonormal, IEEE TVCG 11(3), 2005.
+
+    Args:
+        v: (N,3) array of vertices.
+        f: (M,3) array of faces.
+    Returns:
+        face_normals: (M,3) array of unit face normals.
+        edge_normals: (M,3,3) array of the normals of the edges (0,1),(1,2),(2,0) of every face.
+        vertex_normals: (N,3) array of vertex normals.
+    """
+    tri = v[f]
+    normal = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normal = np.nan_to_num(normal / np.linalg.norm(normal, axis=1)[:, np.newaxis])
+
+    # Edges are shared by neighbouring faces
+    edges = np.stack((f, np.roll(f, -1, axis=1)), axis=2).reshape((-1, 2))
+    _, edge_index = np.unique(np.sort(edges, axis=1), axis=0, return_inverse=True)
+    edge_index = edge_index.reshape(-1)
+    edge_sum = np.zeros((edge_index.max() + 1, 3))
+    np.add.at(edge_sum, edge_index, np.repeat(normal, 3, axis=0))
+    edge_normals = edge_sum[edge_index].reshape((-1, 3, 3))
+
+    # Vertex normals weighted by the angles of the faces at the vertex
+    vertex_normals = np.zeros((len(v), 3))
+    for k in range(0, 3):
+        x = tri[:, (k + 1) % 3] - tri[:, k]
+        y = tri[:, (k + 2) % 3] - tri[:, k]
+        angle = np.arctan2(
+            np.linalg.norm(np.cross(x, y), axis=1), np.einsum("ij,ij->i", x, y)
+        )
+        np.add.at(vertex_normals, f[:, k], angle[:, np.newaxis] * normal)
+    return normal, edge_normals, vertex_normals
+
+
+class TriangleBVH:
+    """Implicit bounding volume hierarchy over the triangles of a mesh.
+
+    Triangles are sorted along a Morton curve and grouped in leaves of leaf_size triangles. The
+    leaves are padded with empty boxes to a power of two, so that the children of node i at one
+    level are nodes 2i and 2i+1 of the level below.
+
+    attributes:
+        v: (N,3) array of vertices.
+        f: (M,3) array of faces.
+        leaf_faces: (L,leaf_size) array of the faces of each leaf, -1 for padding.
+        levels: list of (lo,hi) pairs of box corners, from the leaves to the root.
+
+    methods:
+        overlapping_leaves: pairs of leaves with overlapping boxes.
+        overlapping_faces: pairs of faces with overlapping boxes.
+        self_intersections: pairs of intersecting faces.
+        closest_points: closest points of the mesh to points.
+        signed_distance: signed distances of points to a closed mesh.
+    """
+
+    def __init__(self, v, f, leaf_size=4):
+        self.v = np.asarray(v, dtype=float)
+        self.f = np.asarray(f, dtype=int)
+        self.leaf_size = leaf_size
+
+        # Boxes of every triangle
+        tri = self.v[self.f]
+        self.lo = tri.min(axis=1)
+        self.hi = tri.max(axis=1)
+
+        # Sort triangles along a Morton curve and group into leaves
+        M = len(self.f)
+        order = np.argsort(morton_codes(tri.mean(axis=1)), kind="stable")
+        n_leaves = max(1, int(np.ceil(M / leaf_size)))
+        n_leaves = 2 ** int(np.ceil(np.log2(n_leaves)))
+        leaf_faces = np.full(n_leaves * leaf_size, -1, dtype=int)
+        leaf_faces[:M] = order
+        self.leaf_faces = leaf_faces.reshape((n_leaves, leaf_size))
+
+        # Leaf boxes, padding faces get empty boxes
+        lo = np.vstack((self.lo, np.full((1, 3), np.inf)))[self.leaf_faces]
+        hi = np.vstack((self.hi, np.full((1, 3), -np.inf)))[self.leaf_faces]
+        self.levels = [(lo.min(axis=1), hi.max(axis=1))]
+
+        # Merge pairs of boxes up to the root
+        while len(self.levels[-1][0]) > 1:
+            lo, hi = self.levels[-1]
+            self.levels.append(
+                (np.minimum(lo[0::2], lo[1::2]), np.maximum(hi[0::2], hi[1::2]))
+            )
+        return None
+
+    def overlapping_leaves(self):
+        """Returns the (K,2) array of pairs i<=j of leaves with overlapping boxes."""
+        pairs = np.zeros((1, 2), dtype=int)
+        for lo, hi in self.levels[-2::-1]:
+            # Expand every pair into the pairs of their children
+            a = (2 * pairs[:, [0]] + np.array([0, 0, 1, 1])).ravel()
+            b = (2 * pairs[:, [1]] + np.array([0, 1, 0, 1])).ravel()
+            same = np.repeat(pairs[:, 0] == pairs[:, 1], 4)
+            keep = ~same | (a <= b)
+            a, b = a[keep], b[keep]
+            keep = _boxes_overlap(lo[a], hi[a], lo[b], hi[b])
+            pairs = np.stack((a[keep], b[keep]), axis=1)
+        if len(self.levels) == 1:
+            lo, hi = self.levels[0]
+            if not _boxes_overlap(lo, hi, lo, hi)[0]:
+                pairs = np.zeros((0, 2), dtype=int)
+        return pairs
+
+    def overlapping_faces(self, chunk_size=50000):
+        """Yields (K,2) arrays of pairs i<j of faces with overlapping boxes."""
+        leaf_pairs = self.overlapping_leaves()
+        n = self.leaf_size
+        lo_leaf, hi_leaf = self.levels[0]
+        lo = np.vstack((self.lo, np.full((1, 3), np.inf)))
+        hi = np.vstack((self.hi, np.full((1, 3), -np.inf)))
+        upper = np.triu(np.ones((n, n), dtype=bool), 1)
+        for start in range(0, len(leaf_pairs), chunk_size):
+            la, lb = leaf_pairs[start : start + chunk_size].T
+            fa = self.leaf_faces[la]
+            fb = self.leaf_faces[lb]
+
+            # Faces of each leaf overlapping the box of the other leaf
+            in_b = np.all(lo[fa] <= hi_leaf[lb, np.newaxis], axis=2) & np.all(
+                lo_leaf[lb, np.newaxis] <= hi[fa], axis=2
+            )
+            in_a = np.all(lo[fb] <= hi_leaf[la, np.newaxis], axis=2) & np.all(
+                lo_leaf[la, np.newaxis] <= hi[fb], axis=2
+            )
+            keep = in_b[:, :, np.newaxis] & in_a[:, np.newaxis, :]
+            keep[la == lb] &= upper
+            k, i, j = np.nonzero(keep)
+            a = fa[k, i]
+            b = fb[k, j]
+            keep = _boxes_overlap(self.lo[a], self.hi[a], self.lo[b], self.hi[b])
+            yield np.stack((a[keep], b[keep]), axis=1)
+
+    def self_intersections(self, first_only=False):
+        """Finds the pairs of faces of the mesh which intersect each other.
+        Args:
+            first_only: (bool) stop after the first chunk containing an intersection.
+        Returns:
+            pairs: (K,2) array of pairs of intersecting faces.
+        """
+        found = []
+        for pairs in self.overlapping_faces():
+            pairs = pairs[triangles_intersect(self.v, self.f, pairs)]
+            found.append(pairs)
+            if first_only and len(pairs) > 0:
+                break
+        if len(found) == 0:
+            return np.zeros((0, 2), dtype=int)
+        return np.vstack(found)
+
+    def _closest_faces(self, p, k, f):
+        """Finds the closest of faces f to points p[k], for sorted k.
+        Returns:
+            best: array of the index in k of the closest face of every point in k.
+            d: array of the distances of p[k] to the faces f, infinite for degenerate faces.
+            q: array of the closest points of the faces f.
+            region: array of the regions of the closest points, see closest_points_on_triangles.
+        """
+        tri = self.v[self.f[f]]
+        q, region = closest_points_on_triangles(p[k], tri[:, 0], tri[:, 1], tri[:, 2])
+        d = np.nan_to_num(np.linalg.norm(p[k] - q, axis=1), nan=np.inf)
+        first = np.flatnonzero(np.diff(k, prepend=-1))
+        count = np.diff(np.append(first, len(k)))
+        best = np.flatnonzero(d == np.repeat(np.minimum.reduceat(d, first), count))
+        best = best[np.flatnonzero(np.diff(k[best], prepend=-1))]
+        return best, d, q, region
+
+    def closest_points(self, points, chunk_size=10000):
+        """Finds the closest points of the mesh to points.
+
+        The distance to the faces around the vertex nearest to every point, found with a KD-tree,
+        bounds the distance to the mesh. Every point then descends the hierarchy keeping the nodes
+        whose box is within the bound, and the faces of the remaining leaves are checked.
+
+        Args:
+            points: (K,3) array of points.
+            chunk_size: (int) number of points processed at once, to bound memory.
+        Returns:
+            distance: (K,) array of distances.
+            closest: (K,3) array of closest points.
+            face: (K,) array of the faces of the closest points.
+            region: (K,) array of the regions of the closest points on their faces, see closest_points_on_triangles.
+        """
+        points = np.asarray(points, dtype=float).reshape((-1, 3))
+        K = len(points)
+        distance = np.zeros(K)
+        closest = np.zeros((K, 3))
+        face = np.zeros(K, dtype=int)
+        region = np.zeros(K, dtype=int)
+
+        # Faces around every vertex
+        corners = self.f.ravel()
+        vertex_faces = np.argsort(corners, kind="stable") // 3
+        count = np.bincount(corners, minlength=len(self.v))
+        offsets = np.concatenate(([0], np.cumsum(count)))
+        vertices = np.flatnonzero(count)
+        tree = cKDTree(self.v[vertices])
+
+        # Boxes as (lo,-hi), so that the gaps to points p are the positive parts of box - (p,-p)
+        boxes = [np.hstack((lo, -hi)) for lo, hi in self.levels]
+
+        for start in range(0, K, chunk_size):
+            p = points[start : start + chunk_size]
+
+            # Bound the squared distances by the faces around the nearest vertex
+            nearest = vertices[tree.query(p)[1]]
+            n = count[nearest]
+            k_around = np.repeat(np.arange(len(p)), n)
+            f_around = vertex_faces[
+                np.arange(n.sum()) - np.repeat(np.cumsum(n) - n - offsets[nearest], n)
+            ]
+            best, d, _, _ = self._closest_faces(p, k_around, f_around)
+            bound = d[best] ** 2
+
+            k = np.arange(len(p))
+            node = np.zeros(len(p), dtype=int)
+            signed_p = np.hstack((p, -p))
+            for box in boxes[-2::-1]:
+                # Expand every node into its children
+                k = np.repeat(k, 2)
+                node = 2 * np.repeat(node, 2)
+                node[1::2] += 1
+                gap = np.maximum(box[node] - signed_p[k], 0)
+                gap = gap[:, :3] + gap[:, 3:]
+                keep = np.einsum("ij,ij->i", gap, gap) <= bound[k]
+                k, node = k[keep], node[keep]
+
+            # Faces of the remaining leaves whose box is within the bound
+            k = np.repeat(k, self.leaf_size)
+            f = self.leaf_faces[node].ravel()
+            k, f = k[f >= 0], f[f >= 0]
+            gap = np.maximum(self.lo[f] - p[k], 0) + np.maximum(p[k] - self.hi[f], 0)
+            keep = np.einsum("ij,ij->i", gap, gap) <= bound[k]
+
+            # Exact distances, including the faces giving the bound
+            k = np.concatenate((k[keep], k_around))
+            f = np.concatenate((f[keep], f_around))
+            order = np.argsort(k, kind="stable")
+            k, f = k[order], f[order]
+            best, d, q, r = self._closest_faces(p, k, f)
+            stop = start + len(p)
+            distance[start:stop] = d[best]
+            closest[start:stop] = q[best]
+            face[start:stop] = f[best]
+            region[start:stop] = r[best]
+        return distance, closest, face, region
+
+    def signed_distance(self, points, chunk_size=10000):
+        """Computes the signed distances of points to a closed mesh, positive outside.
+
+        The sign is given by the angle weighted pseudonormal at the closest point, which is exact for
+        closed meshes with outward normals.
+
+        Args:
+            points: (K,3) array of points.
+            chunk_size: (int) number of points processed at once, to bound memory.
+        Returns:
+            distance: (K,) array of signed distances.
+        """
+        points = np.asarray(points, dtype=float).reshape((-1, 3))
+        face_normals, edge_normals, vertex_normals = pseudonormals(self.v, self.f)
+        distance, closest, face, region = self.closest_points(points, chunk_size)
+
+        normal = face_normals[face]
+        edge = (region >= 1) & (region <= 3)
+        normal[edge] = edge_normals[face[edge], region[edge] - 1]
+        vertex = region >= 4
+        normal[vertex] = vertex_normals[self.f[face[vertex], region[vertex] - 4]]
+        outside = np.einsum("ij,ij->i", points - closest, normal) > 0
+        return np.where(outside, distance, -distance)
+
+
+def is_edge_manifold(f):
+    """Checks that every edge of a mesh is shared by exactly two faces, as in trimesh.
+    Args:
+        f: (M,3) array of faces.
+    Returns:
+        flag: (bool)
+    """
+    f = np.asarray(f, dtype=int)
+    if len(f) == 0:
+        return False
+    edges = np.sort(np.vstack((f[:, [0, 1]], f[:, [1, 2]], f[:, [2, 0]])), axis=1)
+    keys = np.sort(edges[:, 0] * (int(f.max()) + 1) + edges[:, 1])
+    # Sorted keys come in equal pairs, with no key shared between pairs.
+    if len(keys) % 2 == 1:
+        return False
+    return bool(np.all(keys[0::2] == keys[1::2]) and np.all(keys[2::2] != keys[1:-1:2]))
+
+
+def has_self_intersections(v, f):
+    """Checks whether any two faces of a mesh intersect.
+    Args:
+        v: (N,3) array of vertices.
+        f: (M,3) array of faces.
+    Returns:
+        flag: (bool)
+    """
+    return len(TriangleBVH(v, f).self_intersections(first_only=True)) > 0
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import zipfile
+import numpy as np
+
+# Cache of processed Swc skeletons and alpha wrapped meshes, set ALPHA_MESH_SWC_CACHE to an empty
+# string to disable it
+CACHE_DIR = os.environ.get(
+    "ALPHA_MESH_SWC_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "alpha_mesh_swc"),
+)
+SWC_CACHE_SIZE = 256 * 2**20
+ALPHA_CACHE_SIZE = 2 * 2**30
+
+
+def content_hash(files=(), arrays=(), **params):
+    """Hash of the contents of files, arrays and of parameters, used as the key of cached data.
+    Args:
+        files: (list) paths of the files the data is computed from.
+        arrays: (list) arrays the data is computed from.
+        params: parameters the data depends on.
+    Returns:
+        key: (string) hexadecimal SHA-256 digest.
+    """
+    h = hashlib.sha256()
+    for file in files:
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        h.update(f"{array.dtype.str}{array.shape}".encode())
+        h.update(array.tobytes())
+    h.update(repr(sorted(params.items())).encode())
+    return h.hexdigest()
+
+
+def cache_file(cache_dir, prefix, key, ext=".npy"):
+    """Path of the cached data with a key in cache_dir."""
+    return os.path.join(cache_dir, f"{prefix}_{key}{ext}")
+
+
+def save_atomic(name, save):
+    """Write a file with save(f) into a temporary file, which then replaces name at once.
+    Concurrent readers see either the previous file or the complete new one.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(name)), exist_ok=True)
+    temp_file = f"{name}.{os.getpid()}.tmp"
+    with open(temp_file, "wb") as f:
+        save(f)
+    os.replace(temp_file, name)
+    return None
+
+
+def load_array(name):
+    """Returns the array cached in a .npy file, None if it does not exist."""
+    if not os.path.isfile(name):
+        return None
+    return np.load(name)
+
+
+def save_array(name, array):
+    """Caches an array in a .npy file."""
+    save_atomic(name, lambda f: np.save(f, array))
+    return None
+
+
+class LRUCache:
+    """Directory of cached .npz files bounded in size, evicting the least recently used files first.
+    The access time of a file is kept as its modification time, so the cache is shared between processes.
+    attributes:
+        cache_dir: (string) directory of the cached files.
+        prefix: (string) prefix of the names of the cached files.
+        max_size: (int) maximum total size of the cached files in bytes.
+
+    methods:
+        load: arrays cached under a key.
+        save: cache arrays under a key.
+        evict: remove the least recently used files until the cache fits in max_size.
+    """
+
+    def __init__(self, cache_dir, prefix="swc", max_size=SWC_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.prefix = prefix
+        self.max_size = max_size
+        return None
+
+    def file(self, key):
+        """Path of the file cached under a key."""
+        return cache_file(self.cache_dir, self.prefix, key, ".npz")
+
+    def load(self, key):
+        """Returns the dictionary of arrays cached under key, None if they are not cached."""
+        name = self.file(key)
+        try:
+            with np.load(name) as data:
+                arrays = {k: data[k] for k in data.files}
+            os.utime(name)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zipfile.BadZipFile):
+            # Unreadable files are dropped and recomputed
+            self._remove(name)
+            return None
+        return arrays
+
+    def save(self, key, arrays):
+        """Caches a dictionary of arrays under key, then evicts old files."""
+        save_atomic(self.file(key), lambda f: np.savez(f, **arrays))
+        self.evict()
+        return None
+
+    def evict(self):
+        """Removes the least recently used files until the cache fits in max_size."""
+        files = []
+        for file in os.listdir(self.cache_dir):
+            if file.startswith(f"{self.prefix}_") and file.endswith(".npz"):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, file))
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, file))
+        size = sum(s for _, s, _ in files)
+        for _, s, file in sorted(files):
+            if size <= self.max_size:
+                break
+            self._remove(os.path.join(self.cache_dir, file))
+            size -= s
+        return None
+
+    @staticmethod
+    def _remove(name):
+        # Another process may have removed the file already
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+        return None
+
+
+def default_swc_cache():
+    """Cache of processed Swc skeletons in CACHE_DIR, None if CACHE_DIR is empty."""
+    if not CACHE_DIR:
+        return None
+    return LRUCache(CACHE_DIR, "swc", SWC_CACHE_SIZE)
+
+
+def default_alpha_cache():
+    """Cache of alpha wrapped meshes in CACHE_DIR, None if CACHE_DIR is empty."""
+    if not CACHE_DIR:
+        return None
+    return LRUCache(CACHE_DIR, "alpha", ALPHA_CACHE_SIZE)
@@ -13,7 +13,45 @@ def get_geom_stats(ms):
     return surface_area, mesh_volume, avg_edge_length
 
 
-def find_mesh_quality(tet_file):
+def shape_measures(nodes, elements, chunk_size=100000):
+    """Computes the shape measure 3/kappa of every tetrahedron, where kappa is the condition number
+    of the Jacobian relative to a regular tetrahedron. Degenerate elements have measure 0.
+    Args:
+        nodes: (N,3) array of nodes.
+        elements: (M,4) array of elements.
+        chunk_size: (int) number of elements processed at once, to bound memory.
+    Returns:
+        q: (M,) array of shape measures in [0,1], 1 for regular tetrahedra.
+    """
+    W = np.array(
+        [[1, 0.5, 0.5], [0, np.sqrt(3) / 2, np.sqrt(3) / 6], [0, 0, np.sqrt(2 / 3)]]
+    )
+    Winv = np.linalg.inv(W)
+    q = np.zeros(len(elements))
+    for start in range(0, len(elements), chunk_size):
+        e = elements[start : start + chunk_size]
+        # Edge vectors from the first node, the columns of the Jacobians A
+        a = nodes[e[:, 1:]] - nodes[e[:, [0]]]
+        det = np.einsum("ij,ij->i", a[:, 0], np.cross(a[:, 1], a[:, 2]))
+        # Rows of the adjugate, det(A) inv(A) = adj(A)
+        adj = np.stack(
+            (
+                np.cross(a[:, 1], a[:, 2]),
+                np.cross(a[:, 2], a[:, 0]),
+                np.cross(a[:, 0], a[:, 1]),
+            ),
+            axis=1,
+        )
+        # 3/kappa = 3|det(A)| / (|A Winv| |W adj(A)|) in the Frobenius norm
+        norm_A = np.linalg.norm(np.matmul(a.transpose(0, 2, 1), Winv), axis=(1, 2))
+        norm_adj = np.linalg.norm(np.matmul(W, adj), axis=(1, 2))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            q_chunk = 3 * np.abs(det) / (norm_A * norm_adj)
+        q[start : start + len(e)] = np.nan_to_num(q_chunk, nan=0.0)
+    return q
+
+
+def find_mesh_quality(tet_file, return_measures=False, cache=False):
     """Finds the quality of a finite element mesh by finding the propotion of elements with a condition number greater than 0.5.
     Condition number is defined as in:
 
@@ -21,29 +59,69 @@ def find_mesh_quality(tet_file):
     No. SAND99-2542C. Sandia National Lab.(SNL-NM), Albuquerque, NM (United States);
     Sandia National Lab.(SNL-CA), Livermore, CA (United States), 1999.
 
+    Args:
+        tet_file: (string) name of the TetGen files without the .node and .ele extensions.
+        return_measures: (bool) flag to also return the shape measure of every element.
+        cache: (bool) flag to keep the TetGen mesh in .npy files for faster reading, see read_tetgen.
+    Returns:
+        mesh_quality: (float) proportion of elements with shape measure greater than 0.5.
+        mesh_size: (int) number of nodes.
+        q: (M,) array of shape measures, only if return_measures is set.
     """
-    nodes, elements = read_tetgen(tet_file)
-    W = np.array(
-        [[1, 0.5, 0.5], [0, np.sqrt(3) / 2, np.sqrt(3) / 6], [0, 0, np.sqrt(2 / 3)]]
-    )
-    Winv = np.linalg.inv(W)
-    A = lambda e: np.vstack(
-        (
-            nodes[e[1]] - nodes[e[0]],
-            nodes[e[2]] - nodes[e[0]],
-            nodes[e[3]] - nodes[e[0]],
-        )
-    ).T
-    frob_norm = lambda x: np.sqrt(np.trace(np.matmul(x, x.T)))
-    kappa = lambda A: frob_norm(np.matmul(A, Winv)) * frob_norm(
-        np.matmul(W, np.linalg.inv(A))
-    )
-    shape_measures = [3 / kappa(A(e)) for e in elements]
-    mesh_quality = np.mean(np.array(shape_measures) > 0.5)
+    nodes, elements = read_tetgen(tet_file, cache=cache)
+    q = shape_measures(nodes, elements)
+    mesh_quality = np.mean(q > 0.5)
     mesh_size = len(nodes)
+    if return_measures:
+        return mesh_quality, mesh_size, q
     return mesh_quality, mesh_size
 
 
+def surface_distances(v, f, points):
+    """Computes the unsigned distances of points to a surface mesh with pymeshlab.
+    Args:
+        v: (N,3) array of vertices.
+        f: (M,3) array of faces.
+        points: (K,3) array of points.
+    Returns:
+        d: (K,) array of distances.
+    """
+    points = np.asarray(points, dtype=float).reshape((-1, 3))
+    ms = mlab.MeshSet()
+    ms.add_mesh(mlab.Mesh(vertex_matrix=v, face_matrix=f))
+    ms.add_mesh(mlab.Mesh(vertex_matrix=points))
+    ms.compute_scalar_by_distance_from_another_mesh_per_vertex(
+        measuremesh=1, refmesh=0, signeddist=False
+    )
+    return ms.current_mesh().vertex_scalar_array()
+
+
+def skeleton_mesh_error(ms, points, return_distances=False):
+    """Computes the Skeleton to Mesh Error, the distances of a point cloud over the swc to the mesh.
+    Args:
+        ms: (MeshSet) surface mesh.
+        points: (K,3) array of points of the point cloud.
+        return_distances: (bool) flag to also return the distance of every point.
+    Returns:
+        dist: (dict) RMS, max, mean and min of the distances, and the bounding box diagonals of the
+        point cloud and the mesh.
+        d: (K,) array of distances, only if return_distances is set.
+    """
+    v = ms.current_mesh().vertex_matrix()
+    f = ms.current_mesh().face_matrix()
+    d = surface_distances(v, f, points)
+    dist = {}
+    dist["RMS"] = np.sqrt(np.mean(d**2))
+    dist["max"] = np.max(d)
+    dist["mean"] = np.mean(d)
+    dist["min"] = np.min(d)
+    dist["diag_swc"] = np.linalg.norm(np.ptp(points, axis=0))
+    dist["diag_mesh"] = np.linalg.norm(np.ptp(v, axis=0))
+    if return_distances:
+        return dist, d
+    return dist
+
+
 def mesh_stats(swc, ms, ms_alpha, mesh_name):
     """Function to compute relevent summary data to be stored as a dictionary and saved in output log file."""
     # Store mesh data from final mesh
@@ -0,0 +1,148 @@
+import json
+import os
+import numpy as np
+import pymeshlab as mlab
+from .mesh_processing import MeshArrays
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+# Output formats and the extension of their files
+MESH_FORMATS = {"ply": ".ply", "ascii_ply": ".ply", "npz": ".npz", "h5": ".h5"}
+
+# Extensions of mesh files which can be read back
+MESH_EXTENSIONS = (".ply", ".obj", ".npz", ".h5")
+
+# Extensions of containers holding the arrays and metadata of a mesh
+CONTAINER_EXTENSIONS = (".npz", ".h5")
+
+# Suffix of the ASCII PLY copies of meshes written for TetGen
+TETGEN_SUFFIX = "_tetgen.ply"
+
+
+def mesh_extension(mesh_format):
+    """Returns the file extension of a mesh format."""
+    if mesh_format not in MESH_FORMATS:
+        raise ValueError(
+            f"Unknown mesh format {mesh_format}, expected one of {list(MESH_FORMATS)}."
+        )
+    return MESH_FORMATS[mesh_format]
+
+
+def is_mesh_file(file):
+    """Checks whether a file name has the extension of a readable mesh, skipping copies made for TetGen."""
+    return file.endswith(MESH_EXTENSIONS) and not file.endswith(TETGEN_SUFFIX)
+
+
+def is_container(file):
+    """Checks whether a file name has the extension of a mesh container."""
+    return file.endswith(CONTAINER_EXTENSIONS)
+
+
+def _require_h5py():
+    if h5py is None:
+        raise ImportError("h5py is needed to read and write .h5 meshes.")
+    return None
+
+
+def _to_json(metadata):
+    """Serialise metadata, converting numpy values to python ones."""
+    return json.dumps(metadata, default=lambda x: np.asarray(x).tolist())
+
+
+def _write_container(name, mesh, metadata):
+    """Write the arrays of a mesh and its metadata into a .npz or .h5 container."""
+    arrays = {"vertices": mesh.v, "faces": mesh.f}
+    if mesh.q is not None:
+        arrays["vertex_quality"] = mesh.q
+    metadata = _to_json({} if metadata is None else metadata)
+    if name.endswith(".npz"):
+        with open(name, "wb") as f:
+            np.savez_compressed(f, metadata=np.array(metadata), **arrays)
+    else:
+        _require_h5py()
+        with h5py.File(name, "w") as f:
+            for key, value in arrays.items():
+                f.create_dataset(key, data=value, compression="gzip")
+            f.attrs["metadata"] = metadata
+    return None
+
+
+def _read_container(name):
+    """Read the arrays of a mesh and its metadata from a .npz or .h5 container."""
+    if name.endswith(".npz"):
+        with np.load(name) as data:
+            arrays = {key: data[key] for key in data.files}
+            metadata = str(arrays.pop("metadata"))
+    else:
+        _require_h5py()
+        with h5py.File(name, "r") as f:
+            arrays = {key: f[key][()] for key in f.keys()}
+            metadata = f.attrs["metadata"]
+    mesh = MeshArrays(
+        arrays["vertices"], arrays["faces"], arrays.get("vertex_quality", None)
+    )
+    return mesh, json.loads(metadata)
+
+
+def save_mesh(ms, name, mesh_format=None, metadata=None):
+    """Save the current mesh of a MeshSet.
+
+    PLY files are written in binary unless mesh_format is "ascii_ply". The .npz and .h5
+    containers hold the vertices, faces and vertex quality of the mesh with a dictionary of
+    metadata, which is not stored in PLY files.
+
+    Args:
+        ms: (MeshSet) mesh to save.
+        name: (string) path of the mesh file.
+        mesh_format: (string) "ply", "ascii_ply", "npz" or "h5". Defaults to the format given by the extension of name.
+        metadata: (dict) JSON serialisable data stored with the mesh in containers.
+    """
+    if mesh_format is None:
+        mesh_format = os.path.splitext(name)[1][1:]
+    mesh_extension(mesh_format)
+    if mesh_format in ["ply", "ascii_ply"]:
+        ms.save_current_mesh(name, binary=mesh_format == "ply")
+    else:
+        _write_container(name, MeshArrays.from_meshset(ms), metadata)
+    return None
+
+
+def load_mesh(name, ms=None):
+    """Load a mesh file as a new mesh of a MeshSet.
+    Args:
+        name: (string) path of a mesh file, either a container or any format read by pymeshlab.
+        ms: (MeshSet) optional MeshSet to add the mesh to.
+    Returns:
+        ms: (MeshSet) MeshSet with the loaded mesh as its current mesh.
+    """
+    if ms is None:
+        ms = mlab.MeshSet()
+    if is_container(name):
+        mesh, _ = _read_container(name)
+        ms.add_mesh(mesh.to_mesh())
+    else:
+        ms.load_new_mesh(name)
+    return ms
+
+
+def load_metadata(name):
+    """Returns the metadata dictionary stored in a mesh container, empty for other files."""
+    if not is_container(name):
+        return {}
+    return _read_container(name)[1]
+
+
+def update_metadata(name, metadata):
+    """Add entries to the metadata stored in a mesh container."""
+    if name.endswith(".h5"):
+        _require_h5py()
+        with h5py.File(name, "a") as f:
+            data = {**json.loads(f.attrs["metadata"]), **metadata}
+            f.attrs["metadata"] = _to_json(data)
+    else:
+        mesh, data = _read_container(name)
+        _write_container(name, mesh, {**data, **metadata})
+    return None
@@ -2,8 +2,13 @@ import numpy as np
 import pymeshlab as mlab
 from trimesh import Trimesh
 import os
+import sys
 from .pytetgen import call_tetgen
+from .bvh import has_self_intersections, is_edge_manifold
 import warnings
+import tempfile
+import shutil
+from multiprocessing import Pool
 
 
 def dcp_meshset(meshset):
@@ -15,6 +20,93 @@ def dcp_meshset(meshset):
     return ms
 
 
+class MeshArrays:
+    """Read-only vertex and face arrays of a mesh, from which fresh MeshSets are built when needed.
+
+    attributes:
+        v: (N,3) array of vertices.
+        f: (M,3) array of faces.
+        q: (N,) array of vertex quality, None if the mesh has none.
+
+    methods:
+        from_meshset: copy the current mesh of a MeshSet.
+        to_mesh: create a new Mesh.
+        to_meshset: create a new MeshSet holding the mesh.
+    """
+
+    def __init__(self, v, f, q=None):
+        self.v = np.array(v, dtype=float)
+        self.f = np.array(f)
+        self.q = None if q is None else np.array(q, dtype=float)
+        for array in [self.v, self.f, self.q]:
+            if array is not None:
+                array.setflags(write=False)
+        return None
+
+    @classmethod
+    def from_meshset(cls, ms):
+        """Copy the current mesh of a MeshSet or a Mesh."""
+        m = ms.current_mesh() if isinstance(ms, mlab.MeshSet) else ms
+        q = m.vertex_scalar_array() if m.has_vertex_scalar() else None
+        return cls(m.vertex_matrix(), m.face_matrix(), q)
+
+    @property
+    def face_number(self):
+        return len(self.f)
+
+    def to_mesh(self):
+        """Create a new Mesh."""
+        if self.q is None:
+            return mlab.Mesh(vertex_matrix=self.v, face_matrix=self.f)
+        # The vertex quality weights the quadric edge collapse
+        return mlab.Mesh(
+            vertex_matrix=self.v, face_matrix=self.f, v_scalar_array=self.q
+        )
+
+    def to_meshset(self):
+        """Create a new MeshSet holding the mesh."""
+        ms = mlab.MeshSet()
+        ms.add_mesh(self.to_mesh())
+        return ms
+
+
+def peak_memory_mb():
+    """Returns the peak resident memory of the process in MB, None if it cannot be measured."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == "darwin":
+        return peak / 1024**2
+    return peak / 1024
+
+
+def concatenate_meshes(parts):
+    """Concatenate meshes into a single vertex and face array.
+
+    Args:
+        parts (list): list of (vertices, faces) pairs of numpy arrays.
+
+    Returns:
+        v (numpy.array): (N,3) array of the vertices of all meshes.
+        f (numpy.array): (M,3) array of the faces of all meshes, indexing into v.
+    """
+
+    # Offsets of each mesh in the buffers
+    v_offsets = np.cumsum([0] + [len(v) for v, _ in parts])
+    f_offsets = np.cumsum([0] + [len(f) for _, f in parts])
+
+    # Fill preallocated buffers
+    v = np.empty((v_offsets[-1], 3))
+    f = np.empty((f_offsets[-1], 3), dtype=int)
+    for i, (v_i, f_i) in enumerate(parts):
+        v[v_offsets[i] : v_offsets[i + 1]] = v_i
+        f[f_offsets[i] : f_offsets[i + 1]] = f_i + v_offsets[i]
+    return v, f
+
+
 def mlab2tmesh(ms):
     """Convert Meshlab mesh to Trimesh object.
 
@@ -50,27 +142,46 @@ def mlab2tmesh(ms):
     return tmesh
 
 
-def is_watertight(ms, name=None):
-    """Check whether the mesh is watertight using trimesh routine and tetgen.
+def is_watertight(ms, name=None, check_tetgen=False):
+    """Check whether the mesh is watertight, i.e every edge is shared by two faces and no faces intersect.
+
+    Self-intersections are found in process with a bounding volume hierarchy over the faces.
 
     Args:
         ms (mlab.Mesh or mlab.MeshSet): mesh.
+        name (string): temporary directory for TetGen.
+        check_tetgen (bool): flag to cross-check self-intersections with TetGen.
     Returns:
         flag: (bool) flag for surface being watertight.
     """
-    # Apply a quick check using trimesh.
-    tmesh = mlab2tmesh(ms)
-
-    print("Checking self-intersections with TetGen")
-    try:
-        no_self_intersections = is_watertight_tetgen(ms, name)
-    except ImportError as e:
-        print(repr(e))
-        warnings.warn("Appplying PymeshLab filter instead. Accuracy may be lower.")
-        ms.compute_selection_by_self_intersections_per_face()
-        no_self_intersections = ms.current_mesh().selected_face_number() == 0
+    # check mesh type
+    if isinstance(ms, mlab.MeshSet):
+        m = ms.current_mesh()
+    elif isinstance(ms, mlab.Mesh):
+        m = ms
+    else:
+        raise TypeError("Unknown mesh type.")
+    v = m.vertex_matrix()
+    f = m.face_matrix()
+
+    no_self_intersections = not has_self_intersections(v, f)
+
+    if check_tetgen:
+        print("Checking self-intersections with TetGen")
+        try:
+            no_tetgen_intersections = is_watertight_tetgen(ms, name)
+        except ImportError as e:
+            print(repr(e))
+            warnings.warn("Appplying PymeshLab filter instead. Accuracy may be lower.")
+            ms.compute_selection_by_self_intersections_per_face()
+            no_tetgen_intersections = ms.current_mesh().selected_face_number() == 0
+        if no_tetgen_intersections != no_self_intersections:
+            warnings.warn(
+                f"Self-intersection checks disagree: bvh = {no_self_intersections}, TetGen = {no_tetgen_intersections}."
+            )
+        no_self_intersections = no_self_intersections and no_tetgen_intersections
 
-    flag = tmesh.is_watertight and no_self_intersections
+    flag = is_edge_manifold(f) and no_self_intersections
 
     return flag
 
@@ -84,7 +195,7 @@ def is_watertight_tetgen(ms, temp_dir_name):
         flag: (bool) flag for surface being watertight.
     """
     if temp_dir_name is None:
-        temp_dir_name = 'temp'
+        temp_dir_name = "temp"
     dir = os.path.join(os.getcwd(), temp_dir_name)
     print(f"Making {dir}")
     if not (os.path.isdir(dir)):
@@ -102,7 +213,7 @@ def is_watertight_tetgen(ms, temp_dir_name):
     return "No faces are intersecting." in output
 
 
-def simplify_mesh_further(ms, targetfacenum, r_min, temp_dir_name):
+def simplify_mesh_further(ms, targetfacenum, r_min, temp_dir_name, check_tetgen=False):
     """Apply remeshing to simplify mesh using quadric edge collapse
 
     Args:
@@ -122,13 +233,214 @@ def simplify_mesh_further(ms, targetfacenum, r_min, temp_dir_name):
         planarquadric=True,
         planarweight=0.002,
     )
-    flag = is_watertight(ms, temp_dir_name)
+    flag = is_watertight(ms, temp_dir_name, check_tetgen)
 
     return ms, flag
 
 
+def search_smallest(attempt, n, search="linear"):
+    """Search for the smallest index k < n for which attempt(k) succeeds.
+
+    attempt(k) returns (result, flag, cap), where flag marks a success and cap marks a failure
+    after which no larger index is tried. The bisection and galloping searches assume that
+    successes and caps persist for larger k and make logarithmically many attempts. Galloping tries
+    k = 0, 1, 3, 7, ... before bisecting, which is faster when the answer is small.
+
+    Args:
+        attempt: function of an index returning (result, flag, cap).
+        n: (int) number of indices.
+        search: (string) "linear", "bisection" or "galloping".
+    Returns:
+        result: result of the smallest successful attempt, None if no attempt succeeded.
+        attempts: (int) number of attempts made.
+    """
+    attempts = 0
+    if search == "linear":
+        for k in range(0, n):
+            result, flag, cap = attempt(k)
+            attempts += 1
+            if flag:
+                return result, attempts
+            if cap:
+                break
+        return None, attempts
+
+    if search not in ["bisection", "galloping"]:
+        raise ValueError(f"Unknown search {search}.")
+
+    # The first success or cap lies in [lo,hi], best is the result at hi if it is a success.
+    best = None
+    lo, hi = 0, n
+    if search == "galloping":
+        step = 1
+        while lo < hi:
+            k = min(lo + step - 1, hi - 1)
+            result, flag, cap = attempt(k)
+            attempts += 1
+            if flag:
+                best, hi = result, k
+                break
+            if cap:
+                hi = k
+                break
+            lo = k + 1
+            step *= 2
+
+    while lo < hi:
+        k = (lo + hi) // 2
+        result, flag, cap = attempt(k)
+        attempts += 1
+        if flag:
+            best, hi = result, k
+        elif cap:
+            best, hi = None, k
+        else:
+            lo = k + 1
+    return best, attempts
+
+
+def _simplification_attempt(
+    mesh, targetfacenum, r_min, temp_dir_name, check_tetgen, old_number, cap
+):
+    """Simplify a new MeshSet of mesh to targetfacenum faces, returning (ms, flag, cap) for search_smallest."""
+    print(f"Applying simplification, target number of faces = {targetfacenum}")
+    ms, flag = simplify_mesh_further(
+        mesh.to_meshset(), targetfacenum, r_min, temp_dir_name, check_tetgen
+    )
+    new_number = ms.current_mesh().face_number()
+    print(
+        f"Old number of faces = {old_number} ,new number of faces = {new_number}, watertight = {flag}"
+    )
+    return ms, flag, cap and not (flag) and new_number > old_number
+
+
+# Source mesh of the simplification attempts of a worker process
+_attempt_mesh = None
+
+
+def _init_attempt_worker(mesh):
+    """Store the mesh to simplify in a worker process."""
+    global _attempt_mesh
+    _attempt_mesh = mesh
+
+
+def _parallel_simplification_attempt(
+    targetfacenum, r_min, temp_dir_name, check_tetgen, old_number, cap
+):
+    """Simplification attempt on the mesh of a worker process, returning MeshArrays instead of a MeshSet."""
+    ms, flag, cap = _simplification_attempt(
+        _attempt_mesh,
+        targetfacenum,
+        r_min,
+        temp_dir_name,
+        check_tetgen,
+        old_number,
+        cap,
+    )
+    return MeshArrays.from_meshset(ms), flag, cap
+
+
+def search_simplification_parallel(
+    mesh, targets, r_min, temp_dir_name, check_tetgen, old_number, cap, workers=None
+):
+    """Simplify mesh to each target number of faces in turn, running attempts ahead in a process pool.
+
+    A window of workers consecutive targets is simplified at once. Results are read in order, so the
+    smallest watertight mesh is the same as for the linear search. The remaining attempts are
+    terminated as soon as it is found.
+
+    Args:
+        mesh: (MeshArrays) mesh to simplify.
+        targets: (list) increasing target numbers of faces.
+        temp_dir_name: (string) name of the directories of the TetGen checks, numbered by attempt. They are
+            always made in a temporary directory, removed afterwards, so attempts terminated during a check
+            leave no files behind. None uses "temp".
+        workers: (int) number of processes. None or 0 uses all cores.
+    Returns:
+        ms: (MeshSet) smallest watertight mesh, None if no attempt succeeded.
+        attempts: (int) number of attempts started.
+    """
+    workers = workers or os.cpu_count()
+    attempts = 0
+    # Every attempt checks with TetGen in its own directory
+    temp_dir = tempfile.mkdtemp()
+    temp_dir_name = os.path.join(temp_dir, os.path.basename(temp_dir_name or "temp"))
+    try:
+        with Pool(workers, initializer=_init_attempt_worker, initargs=(mesh,)) as pool:
+            pending = {}
+            for k in range(0, len(targets)):
+                # Keep the window of attempts full
+                while len(pending) < workers and k + len(pending) < len(targets):
+                    j = k + len(pending)
+                    pending[j] = pool.apply_async(
+                        _parallel_simplification_attempt,
+                        (
+                            targets[j],
+                            r_min,
+                            f"{temp_dir_name}_{j}",
+                            check_tetgen,
+                            old_number,
+                            cap,
+                        ),
+                    )
+                    attempts += 1
+                result, flag, stop = pending.pop(k).get()
+                if flag:
+                    # Leaving the pool terminates the remaining attempts
+                    return result.to_meshset(), attempts
+                if stop:
+                    break
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return None, attempts
+
+
+def _search_simplification(
+    mesh,
+    n,
+    dfaces,
+    min_faces,
+    r_min,
+    temp_dir_name,
+    check_tetgen,
+    old_number,
+    cap,
+    search,
+    workers,
+):
+    """Search the smallest watertight simplification of mesh among n targets min_faces + k*dfaces."""
+    targets = [k * dfaces + min_faces for k in range(0, n)]
+    if search == "parallel":
+        return search_simplification_parallel(
+            mesh,
+            targets,
+            r_min,
+            temp_dir_name,
+            check_tetgen,
+            old_number,
+            cap,
+            workers,
+        )
+    return search_smallest(
+        lambda k: _simplification_attempt(
+            mesh, targets[k], r_min, temp_dir_name, check_tetgen, old_number, cap
+        ),
+        n,
+        search,
+    )
+
+
 def simplify_mesh(
-    ms, dfaces=1000, r_min=0.1, min_faces=2000, temp_dir_name=None, max_attempts=15
+    ms,
+    dfaces=1000,
+    r_min=0.1,
+    min_faces=2000,
+    temp_dir_name=None,
+    max_attempts=15,
+    check_tetgen=False,
+    search="linear",
+    timings=None,
+    workers=None,
 ):
     """Apply remeshing using quadric edge collapse and isotropic remeshing to reduce the number of vertices
     Given a initially very small target number of faces, we remesh the surface mesh to have that number of faces.
@@ -139,13 +451,19 @@ def simplify_mesh(
         dfaces: (int) increments to increase the desired number of faces until a watertight mesh is produced.
         r_min: (float) minimum cross-sectional radius of the swc file.
         min_faces: (int) initial number of target faces.
+        check_tetgen: (bool) flag to cross-check self-intersections with TetGen.
+        search: (string) strategy to search the target number of faces, "linear", "bisection", "galloping" or "parallel".
+        timings: (dict) optional dictionary to record the number of simplification attempts.
+        workers: (int) number of processes for the parallel search. None or 0 uses all cores.
     Returns:
         ms: (MeshSet)
 
     """
+    if search not in ["linear", "bisection", "galloping", "parallel"]:
+        raise ValueError(f"Unknown search {search}.")
 
     # Save the original mesh
-    ms_alpha = dcp_meshset(ms)
+    alpha = MeshArrays.from_meshset(ms)
     # only keep the largest component
     ms.compute_selection_by_small_disconnected_components_per_face(nbfaceratio=0.99)
     ms.meshing_remove_selected_vertices_and_faces()
@@ -156,8 +474,6 @@ def simplify_mesh(
     print("Applying isotropic remeshing")
 
     # Initial isotropic remeshing step.
-    attempt = 1
-    flag = False
     old_number = ms.current_mesh().face_number()
     d = ms.get_geometric_measures()
     bbox = d["bbox"]
@@ -168,57 +484,58 @@ def simplify_mesh(
         checksurfdist=False,
     )
 
-    # Save new mesh
-    ms_cp = dcp_meshset(ms)
+    # Save new mesh, every attempt starts from a new MeshSet of it
+    reference = MeshArrays.from_meshset(ms)
+    ms.clear()
 
     # Attempt aggressive simplification on the new mesh.
-    # if is_watertight(ms,temp_dir_name):
-    agg_simp_terminated = False
-    new_number = 0
-    while not (flag) and attempt < max_attempts:
-        if new_number > old_number:
-            agg_simp_terminated = True
-            break
-        print(f"Applying simplification, attempt = {attempt}")
-
-        ms, flag = simplify_mesh_further(
-            ms, (attempt - 1) * dfaces + min_faces, r_min, temp_dir_name
-        )
-        new_number = ms.current_mesh().face_number()
-        print(
-            f"Old number of faces = {old_number} ,new number of faces = {new_number}, watertight = {flag}"
-        )
-        attempt += 1
-        if not (flag):
-            ms = dcp_meshset(ms_cp)
-    # else:
-    #     print('Isotropic remshing failed to preserve watertightness')
-    #     agg_simp_terminated=True
+    # Stop once a non watertight mesh has more faces than the original mesh.
+    print(f"Applying simplification, search = {search}")
+    ms, attempts = _search_simplification(
+        reference,
+        max_attempts - 1,
+        dfaces,
+        min_faces,
+        r_min,
+        temp_dir_name,
+        check_tetgen,
+        old_number,
+        True,
+        search,
+        workers,
+    )
+    emergency_attempts = 0
 
     # If previous attempt failed, conduct emergency remeshing on the original mesh.
-    if (attempt == max_attempts and not (flag)) or agg_simp_terminated:
-        ms = dcp_meshset(ms_alpha)
+    if ms is None:
+        ms = alpha.to_meshset()
         # only keep the largest component
         ms.compute_selection_by_small_disconnected_components_per_face(nbfaceratio=0.99)
         ms.meshing_remove_selected_vertices_and_faces()
+        reference = MeshArrays.from_meshset(ms)
+        ms.clear()
         print("Emergency remeshing")
-        attempt = 1
-        flag = False
-        ms_cp = dcp_meshset(ms)
-        while not (flag):
-            if attempt * dfaces > 2 * ms.current_mesh().face_number() / 3:
-                break
-            print(f"Applying simplification, attempt = {attempt}")
-            ms, flag = simplify_mesh_further(
-                ms, (attempt - 1) * dfaces + min_faces, r_min, temp_dir_name
-            )
-            new_number = ms.current_mesh().face_number()
-            print(
-                f"Old number of faces = {old_number} ,new number of faces = {new_number}, watertight = {flag}"
-            )
-            attempt += 1
-            if not (flag):
-                ms = dcp_meshset(ms_cp)
+        # Targets stay below two thirds of the original number of faces
+        n = int((2 * reference.face_number) // (3 * dfaces))
+        ms, emergency_attempts = _search_simplification(
+            reference,
+            n,
+            dfaces,
+            min_faces,
+            r_min,
+            temp_dir_name,
+            check_tetgen,
+            old_number,
+            False,
+            search,
+            workers,
+        )
+        if ms is None:
+            ms = reference.to_meshset()
+
+    if timings is not None:
+        timings["simplify_attempts"] = attempts
+        timings["emergency_attempts"] = emergency_attempts
 
     # Return ms, the smallest watertight mesh we can construct from the original.
     # only keep the largest component
@@ -35,9 +35,68 @@ def call_tetgen(file, args="-d"):
     return output
 
 
-def read_tetgen(tet_file):
-    with open(tet_file + ".node", "r") as f:
-        nodes = np.loadtxt(f, skiprows=1, usecols=(1, 2, 3))
-    with open(tet_file + ".ele", "r") as f:
-        elements = np.loadtxt(f, skiprows=1, usecols=(1, 2, 3, 4), dtype=int)
+def _read_tetgen_table(file, columns, dtype):
+    """Reads the first columns of the rows of a TetGen .node or .ele file, using the row count in its header."""
+    with open(file, "r") as f:
+        # Skip comments before the header
+        for skiprows, header in enumerate(f, start=1):
+            if not (header.lstrip().startswith("#") or header.strip() == ""):
+                break
+        else:
+            raise ValueError(f"{file} has no header.")
+    count = int(header.split()[0])
+    return np.loadtxt(
+        file,
+        dtype=dtype,
+        skiprows=skiprows,
+        usecols=tuple(range(0, columns)),
+        max_rows=count,
+        ndmin=2,
+    )
+
+
+def _is_cached(cache_file, file):
+    """Checks whether a cache file exists and is newer than the file it was made from."""
+    return os.path.isfile(cache_file) and os.path.getmtime(
+        cache_file
+    ) >= os.path.getmtime(file)
+
+
+def _save_cache(cache_file, array):
+    """Saves an array to a .npy file, replacing any previous file at once."""
+    temp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(temp_file, "wb") as f:
+        np.save(f, array)
+    os.replace(temp_file, cache_file)
+    return None
+
+
+def read_tetgen(tet_file, cache=False):
+    """Reads the nodes and tetrahedra of a TetGen mesh.
+
+    Element indices are shifted so that they index the rows of nodes, whether TetGen numbered
+    the nodes from 0 or 1. With cache set, the arrays are saved as .node.npy and .ele.npy files
+    next to the mesh, which are memory-mapped on later calls while they are newer than the mesh.
+
+    Args:
+        tet_file: (string) name of the TetGen files without the .node and .ele extensions.
+        cache: (bool) flag to read and write the .npy cache files.
+    Returns:
+        nodes: (N,3) array of nodes.
+        elements: (M,4) array of node indices of the elements.
+    """
+    node_file, ele_file = tet_file + ".node", tet_file + ".ele"
+    node_cache, ele_cache = node_file + ".npy", ele_file + ".npy"
+    if cache and _is_cached(node_cache, node_file) and _is_cached(ele_cache, ele_file):
+        return np.load(node_cache, mmap_mode="r"), np.load(ele_cache, mmap_mode="r")
+
+    nodes = _read_tetgen_table(node_file, 4, float)
+    elements = _read_tetgen_table(ele_file, 5, int)[:, 1:]
+    if len(nodes) > 0:
+        elements -= int(nodes[0, 0])
+    nodes = np.ascontiguousarray(nodes[:, 1:])
+
+    if cache:
+        _save_cache(node_cache, nodes)
+        _save_cache(ele_cache, elements)
     return nodes, elements
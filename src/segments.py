@@ -1,6 +1,7 @@
 import numpy as np
 from numpy import linalg as LA
 from copy import deepcopy as dcp
+from scipy.spatial import cKDTree
 
 class Segment:
     """Template for segments.
@@ -657,13 +658,438 @@ class Frustum(Segment):
         return inner, on, outer, out_near
 
 
-def fibonacci_lattice(n):
-    """http://extremelearning.com.au/evenly-distributing-points-on-a-sphere/"""
+class SegmentCloud:
+    """Point clouds of the spheres and round frusta of a skeleton, stored as flat arrays.
+
+    Segment i is a sphere centred at a[i] of radius ra[i], or a round frustum with bottom
+    center a[i] and radius ra[i] and top center b[i] and radius rb[i]. Its points, normals and
+    mask are the columns offsets[i]:offsets[i+1] of points, normals and keep, and are sampled
+    as in Sphere and Frustum.
+
+    Attributes:
+        is_sphere (ndarray): mask of spheres, size [n,].
+        a (ndarray): sphere and frustum bottom centers, size [n x 3].
+        b (ndarray): frustum top centers, size [n x 3].
+        ra (ndarray): sphere and frustum bottom radii, size [n,].
+        rb (ndarray): frustum top radii, size [n,].
+        h (ndarray): heights of the frusta, size [n,].
+        rotation (ndarray): rotation matrices transforming z-axis to frustum axes, size [n x 3 x 3].
+        color (ndarray): segment colors, size [4 x n].
+        offsets (ndarray): index of the first point of every segment, size [n+1,].
+        owner (ndarray): segment of every point, size [npoint,].
+        points (ndarray): coordinates of sampled points, size [3 x npoint].
+        normals (ndarray): out-pointing normal vectors, size [3 x npoint].
+        keep (ndarray): the mask of points to keep, size [npoint,].
+        r_min (ndarray): minimum radius of every segment, size [n,].
+
+    Methods:
+        from_swc: create the segments of swc data.
+        intersect: check intersection of a segment with the points of another.
+        intersect_points: check intersection of a segment with any points.
+        remove_interior_points: remove points of colliding segments inside each other.
+        outside: mask of points outside all segments.
+        point_slice: slice of the points of a segment.
+        update: update the mask `keep` of a segment.
+        output: output valid points.
+        aabbs: axis-aligned bounding boxes of the valid points of every segment.
+    """
+
+    def __init__(self, is_sphere, a, b, ra, rb, types, density) -> None:
+        """Create the point clouds of all segments.
+
+        Args:
+            is_sphere (ndarray): mask of spheres, size [n,].
+            a, b (ndarray): bottom and top centers, size [n x 3].
+            ra, rb (ndarray): bottom and top radii, size [n,].
+            types (ndarray): swc type of every segment, size [n,].
+            density (float): point cloud density.
+        """
+
+        self.is_sphere = np.asarray(is_sphere, dtype=bool)
+        self.a = np.array(a, dtype=float).reshape(-1, 3)
+        self.b = np.where(self.is_sphere[:, None], self.a, b)
+        self.ra = np.array(ra, dtype=float)
+        self.rb = np.where(self.is_sphere, self.ra, rb)
+        self.density = density
+
+        # Frustum heights and rotations
+        frustum = ~self.is_sphere
+        self.h = np.zeros(len(self.a))
+        self.h[frustum] = LA.norm(self.b[frustum] - self.a[frustum], axis=1)
+        self.rotation = np.tile(np.eye(3), (len(self.a), 1, 1))
+        self.rotation[frustum] = _rotation_matrices(self.b[frustum] - self.a[frustum])
+
+        # Colors encoding the compartment and the minimum radius
+        self.color = Segment.colors[np.where(self.is_sphere, 1, types)].T.copy()
+        rmin = np.minimum(self.r_min, 1)
+        self.color[1, frustum] = np.trunc(rmin[frustum] * 100) / 100
+        self.color[2, frustum] = (rmin[frustum] - self.color[1, frustum]) * 100
+
+        self.points, self.normals = self._create_points()
+        self.keep = np.full(self.points.shape[1], True)
+
+        return None
+
+    @classmethod
+    def from_swc(cls, position_data, radius_data, conn_data, type_data, density=1.0):
+        """Create a sphere for the soma and root nodes and a frustum from the parent of every other node.
+
+        Args:
+            position_data (ndarray): node positions, size [n x 3].
+            radius_data (ndarray): node radii, size [n,].
+            conn_data (ndarray): node and parent indices, size [n x 2].
+            type_data (ndarray): node types, size [n,].
+            density (float, optional): point cloud density. Defaults to 1.0.
+        """
+
+        parent = conn_data[:, 1]
+        is_sphere = (type_data == 1) | (parent == -1)
+        start = np.where(is_sphere, np.arange(len(parent)), parent)
+        return cls(
+            is_sphere,
+            position_data[start],
+            position_data,
+            radius_data[start],
+            radius_data,
+            type_data,
+            density,
+        )
+
+    def __len__(self) -> int:
+        return len(self.a)
+
+    @property
+    def r_min(self):
+        """Minimum radius of every segment."""
+        return np.minimum(self.ra, self.rb)
+
+    @property
+    def lateral_area(self):
+        """Lateral surface area of the frusta."""
+        return 2 * np.pi * np.sqrt(self.h**2 + (self.rb - self.ra) ** 2)
+
+    def _create_points(self):
+        """Create points and normals on all segment surfaces, in the order of Sphere and Frustum.
+
+        Returns:
+            tuple: contains two ndarrays
+                `points`: coordinates of sampled points,
+                `normals`: out-pointing normal vectors.
+        """
+
+        # Number of points of each sphere, top, lateral and bottom part
+        n = len(self)
+        counts = np.zeros((n, 4), dtype=int)
+        sphere = self.is_sphere
+        frustum = ~sphere
+        counts[sphere, 0] = 20 * self.density * (4 * np.pi * self.ra[sphere] ** 2)
+        counts[frustum, 1] = 20 * self.density * (2 * np.pi * self.rb[frustum] ** 2)
+        counts[frustum, 2] = 20 * self.density * self.lateral_area[frustum]
+        counts[frustum, 3] = 20 * self.density * (2 * np.pi * self.ra[frustum] ** 2)
+
+        # Top and bottom take the first and second halves of a sphere lattice
+        lattice_size = counts * np.array([1, 2, 1, 2])
+        lattice_start = counts * np.array([0, 0, 0, 1])
+
+        # Lattice index of every point
+        counts = counts.ravel()
+        part = np.repeat(np.arange(4 * n), counts)
+        self.owner = part // 4
+        self.offsets = np.concatenate(([0], np.cumsum(counts.reshape((n, 4)).sum(1))))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        index = np.arange(len(part)) - starts[part] + lattice_start.ravel()[part]
+        x, y = fibonacci_lattice(index, lattice_size.ravel()[part])
+        part = part % 4
+        seg = self.owner
+
+        # Points on unit spheres, used for spheres, tops and bottoms
+        points = np.zeros((3, len(part)))
+        normals = np.zeros((3, len(part)))
+        on_sphere = part != 2
+        normals[:, on_sphere] = _unitsphere(x[on_sphere], y[on_sphere])
+
+        # Spheres
+        i = part == 0
+        points[:, i] = self.ra[seg[i]] * normals[:, i] + self.a[seg[i]].T
+
+        # Tops and bottoms
+        i = part == 1
+        points[:, i] = self.rb[seg[i]] * normals[:, i]
+        points[2, i] += self.h[seg[i]]
+        i = part == 3
+        points[:, i] = self.ra[seg[i]] * normals[:, i]
+
+        # Laterals
+        i = part == 2
+        ra, rb, h = self.ra[seg[i]], self.rb[seg[i]], self.h[seg[i]]
+        theta = 2 * np.pi * x[i]
+        z = h * y[i]
+        r = ra + (rb - ra) * z / h
+        points[0, i] = np.cos(theta) * r
+        points[1, i] = np.sin(theta) * r
+        points[2, i] = z
+        # Local lateral normal at theta = 0, rotated around the axis
+        normal = np.stack((h, rb - ra)) / LA.norm(np.stack((rb - ra, h)), axis=0)
+        normals[0, i] = np.cos(theta) * normal[0]
+        normals[1, i] = np.sin(theta) * normal[0]
+        normals[2, i] = -normal[1]
+
+        # Move the local frusta
+        i = part != 0
+        points[:, i] = _rotate(self.rotation, seg[i], points[:, i]) + self.a[seg[i]].T
+        normals[:, i] = _rotate(self.rotation, seg[i], normals[:, i])
+
+        return points, normals
+
+    def point_slice(self, i):
+        """Slice of the points of segment i."""
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    def _masks(self, index, points, r_min):
+        """Masks of inner, on-interface, outer and outer near points, as in Sphere.intersect and
+        Frustum.intersect, relative to segment index[k] for every point k.
+
+        Args:
+            index (int or ndarray): segment of every point, size [npoint,].
+            points (ndarray): coordinates of points, size [3 x npoint].
+            r_min (float or ndarray): minimum radius used for the `out_near` mask.
+        """
+
+        index = np.broadcast_to(index, points.shape[1])
+        sphere = self.is_sphere[index]
+        points = points - self.a[index].T
+        dist = np.full(points.shape[1], np.nan)
+        dist[sphere] = LA.norm(points[:, sphere], axis=0) - self.ra[index[sphere]]
+
+        # Transform points to the local coordinates of the frusta
+        i = np.flatnonzero(~sphere)
+        ra, rb, h = self.ra[index[i]], self.rb[index[i]], self.h[index[i]]
+        local = _rotate(self.rotation.transpose(0, 2, 1), index[i], points[:, i])
+        z = local[2, :].copy()
+        top = z >= h
+        local[2, top] -= h[top]
+        dist[i[top]] = LA.norm(local[:, top], axis=0) - rb[top]
+        bottom = (z <= 0) & ~top
+        dist[i[bottom]] = LA.norm(local[:, bottom], axis=0) - ra[bottom]
+        lateral = (z > 0) & (z < h)
+        r = ra[lateral] + (rb[lateral] - ra[lateral]) * z[lateral] / h[lateral]
+        dist[i[lateral]] = LA.norm(local[:2, lateral], axis=0) - r
+
+        # Spheres use a wider margin
+        eps = np.where(sphere, 1e-3, 1e-14)
+        inner = dist < -eps
+        on = (-eps <= dist) & (dist <= eps)
+        outer = dist > np.where(sphere, 1e-3 * 10, 1e-14)
+        out_near = (dist > eps) & (dist < 0.1 * r_min)
+        return inner, on, outer, out_near
+
+    def _pair_r_min(self, i, j):
+        """Minimum radius used when segment i intersects the points of segment j."""
+        sphere_i, sphere_j = self.is_sphere[i], self.is_sphere[j]
+        r_min_i, r_min_j = self.r_min[i], self.r_min[j]
+        return np.where(
+            sphere_i,
+            np.where(sphere_j, np.minimum(r_min_i, r_min_j), r_min_j),
+            np.where(sphere_j, r_min_i, np.minimum(r_min_i, r_min_j)),
+        )
+
+    def intersect(self, i, j):
+        """Check intersection of segment i with the points of segment j.
+
+        Args:
+            i (int): index of the segment.
+            j (int): index of the segment whose points are checked.
+
+        Returns:
+            tuple: masks `inner`, `on`, `outer` and `out_near` of the points of segment j,
+            as in Sphere.intersect and Frustum.intersect.
+        """
+
+        points = self.points[:, self.point_slice(j)]
+        return self._masks(i, points, self._pair_r_min(i, j))
+
+    def intersect_points(self, i, points):
+        """Check intersection of segment i with points of another surface, size [3 x npoint]."""
+        return self._masks(i, points, self.r_min[i])
+
+    def remove_interior_points(self, pairs, margin=0.02, chunk_size=1000000):
+        """Remove the points of colliding segments inside each other in one pass.
+
+        For every pair (p, c) the points of p inside c, and the points of c inside or on p, are
+        removed, as by updating p with the on and outer masks of c.intersect(p) and c with the
+        outer mask of p.intersect(c). Points outside the bounding box of a segment, grown by
+        margin, are outer points of the segment and are not checked.
+
+        Args:
+            pairs (ndarray): pairs (p, c) of colliding segments, size [npair x 2].
+            margin (float, optional): growth of the bounding boxes, larger than the margins of
+            the masks. Defaults to 0.02.
+            chunk_size (int, optional): maximum number of points checked at once.
+        """
+
+        pairs = np.asarray(pairs, dtype=int).reshape(-1, 2)
+        # Directed checks of the points of target against segment
+        segment = np.concatenate((pairs[:, 1], pairs[:, 0]))
+        target = np.concatenate((pairs[:, 0], pairs[:, 1]))
+        keep_on = np.arange(len(segment)) < len(pairs)
+
+        # Bounding boxes of the spheres at both ends of every segment
+        r = np.stack((self.ra, self.rb), axis=1)[:, :, None]
+        ends = np.stack((self.a, self.b), axis=1)
+        lo = np.min(ends - r, axis=1) - margin
+        hi = np.max(ends + r, axis=1) + margin
+
+        # Split the checks into chunks of at most chunk_size points
+        count = np.diff(self.offsets)[target]
+        cumulative = np.concatenate(([0], np.cumsum(count)))
+        bounds = np.searchsorted(
+            cumulative, np.arange(0, cumulative[-1], max(chunk_size, 1)), side="right"
+        )
+        bounds = np.unique(np.concatenate((bounds - 1, [len(segment)])))
+
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            # Points of every check in the chunk
+            check = np.repeat(np.arange(start, stop), count[start:stop])
+            point = (
+                np.arange(cumulative[start], cumulative[stop])
+                - cumulative[check]
+                + self.offsets[target[check]]
+            )
+
+            # Only check points in the bounding boxes
+            p = self.points[:, point]
+            g = segment[check]
+            inside = np.all((lo[g].T <= p) & (p <= hi[g].T), axis=0)
+            check, point, p, g = check[inside], point[inside], p[:, inside], g[inside]
+
+            _, on, outer, _ = self._masks(g, p, self._pair_r_min(g, target[check]))
+            remove = ~np.where(keep_on[check], on | outer, outer)
+            self.keep[point[remove]] = False
+
+        return None
+
+    def outside(self, points, margin=0.02):
+        """Mask of points of another surface which are outer points of every segment.
+
+        Segments are only checked against the points in their bounding ball grown by margin, found
+        with a KD-tree over the points. Points further away are outer points of the segment.
+
+        Args:
+            points (ndarray): coordinates of points, size [3 x npoint].
+            margin (float, optional): growth of the bounding balls, larger than the margins of
+            the masks. Defaults to 0.02.
+
+        Returns:
+            ndarray: mask of points outside all segments, size [npoint,].
+        """
+
+        mask = np.full(points.shape[1], True)
+        if points.shape[1] == 0:
+            return mask
+        center = (self.a + self.b) / 2
+        radius = self.h / 2 + np.maximum(self.ra, self.rb) + margin
+        near = cKDTree(points.T).query_ball_point(center, radius)
+        count = np.array([len(x) for x in near], dtype=int)
+        if count.sum() == 0:
+            return mask
+        index = np.repeat(np.arange(len(self)), count)
+        point = np.concatenate(near).astype(int)
+        _, _, outer, _ = self.intersect_points(index, points[:, point])
+        mask[point[~outer]] = False
+        return mask
+
+    def update(self, i, mask) -> None:
+        """Update the mask `keep` of segment i.
+
+        Args:
+            i (int): index of the segment.
+            mask (ndarray): mask of the points of the segment.
+        """
+
+        sl = self.point_slice(i)
+        self.keep[sl] = np.logical_and(self.keep[sl], mask.reshape(-1))
+
+        return None
+
+    def output(self, mask=None, i=None):
+        """Output all valid points, or the valid points of segment i.
+
+        Args:
+            mask (ndarray, optional): mask of points.
+            i (int, optional): index of a segment.
+
+        Returns:
+            tuple: valid points, their out-pointing normals and colors.
+        """
+
+        sl = slice(None) if i is None else self.point_slice(i)
+        keep = self.keep[sl] if mask is None else self.keep[sl] & mask
+        p = self.points[:, sl][:, keep]
+        n = self.normals[:, sl][:, keep]
+        color = self.color[:, self.owner[sl][keep]]
+        return p, n, color
+
+    def aabbs(self):
+        """Axis-aligned bounding boxes (xmin,ymin,zmin,xmax,ymax,zmax) of the valid points of
+        every segment, size [n x 6]. Segments without valid points get boxes at -inf."""
+
+        boxes = np.full((len(self), 6), -np.inf)
+        owner = self.owner[self.keep]
+        if len(owner) == 0:
+            return boxes
+        p = self.points[:, self.keep].T
+        # Points are grouped by segment, so reduce over the runs of each segment
+        starts = np.flatnonzero(np.diff(owner, prepend=-1))
+        boxes[owner[starts], :3] = np.minimum.reduceat(p, starts, axis=0)
+        boxes[owner[starts], 3:] = np.maximum.reduceat(p, starts, axis=0)
+        return boxes
+
+
+def _rotation_matrices(axis):
+    """Rotation matrices transforming z-axis to axes, as in Frustum.rotation_matrix, size [n x 3 x 3]."""
+
+    z = np.array([0, 0, 1])
+    c = axis / LA.norm(axis, axis=1)[:, None] + z
+    cc = np.einsum("ni,nj->nij", c, c)
+    R = 2 * cc / np.einsum("ni,ni->n", c, c)[:, None, None] - np.eye(3)
+    # ax = -z
+    R[LA.norm(c, axis=1) < 1e-12] = np.diag([1.0, 1.0, -1.0])
+    return R
+
+
+def _rotate(R, index, v):
+    """Rotate vectors v, size [3 x n], by the matrices R[index]."""
+    return np.stack(
+        [sum(R[index, row, col] * v[col] for col in range(0, 3)) for row in range(0, 3)]
+    )
+
+
+def _unitsphere(x, y):
+    """Points on a unit sphere surface from fibonacci lattice coordinates, size [3 x n]."""
+
+    theta = 2 * np.pi * x
+    phi = np.arccos(1 - 2 * y)
+    return np.stack(
+        (np.cos(theta) * np.sin(phi), np.sin(theta) * np.sin(phi), np.cos(phi))
+    )
+
+
+def fibonacci_lattice(n, size=None):
+    """http://extremelearning.com.au/evenly-distributing-points-on-a-sphere/
+
+    Args:
+        n (int or ndarray): number of points, or the indices of points in lattices of the given size.
+        size (ndarray, optional): number of points of the lattice of each index.
+    """
 
     golden_ratio = (1 + 5**0.5) / 2
-    indices = np.arange(n)
+    if size is None:
+        indices = np.arange(n)
+        size = n
+    else:
+        indices = n
     x, _ = np.modf(indices / golden_ratio)
-    y = (indices + 0.5) / n
+    y = (indices + 0.5) / size
 
     return x, y
 
@@ -2,15 +2,30 @@ import numpy as np
 import warnings
 from numpy.linalg import norm
 import pymeshlab as mlab
-from .tendril import Tendril
+from .tendril import Tendril, make_tendril_mesh
 import os
-from .mesh_processing import simplify_mesh, dcp_meshset
+from .mesh_processing import (
+    simplify_mesh,
+    concatenate_meshes,
+    MeshArrays,
+    peak_memory_mb,
+)
+from .mesh_io import save_mesh, mesh_extension
+from .bvh import overlapping_boxes, TriangleBVH
 import time
 import sys
-from .segments import Sphere, Frustum, Segment
+from .segments import SegmentCloud
+from .cache import content_hash, default_swc_cache, default_alpha_cache
+from .topology import Topology, children_index, preorder
 from multiprocessing import Pool
 from copy import deepcopy as dcp
 
+# Files of the code processing the nodes and building the initial meshes, hashed into the cache keys
+# so changes to it invalidate the cache
+_src = os.path.dirname(os.path.abspath(__file__))
+SWC_CACHE_SOURCES = [os.path.join(_src, file) for file in ["swc.py", "topology.py"]]
+ALPHA_CACHE_SOURCES = [os.path.join(_src, file) for file in ["swc.py", "tendril.py"]]
+
 
 class Swc:
     """Class to store and process nodes from swc data. This class stores the skeleton information we get from the swc files
@@ -25,7 +40,13 @@ class Swc:
         Delta: (processing parameter) target average distance between nodes
         delta: (proccessing parameter) target average distance between nodes close to the soma
         branches: (array) stores the branch to which each node belongs.
+        topology: (Topology) parents, children, depth, subtree sizes and branches of the nodes.
+            Built on first access and rebuilt after conn_data or type_data are reassigned.
+        children_index: (tuple) offsets and children arrays, the children of node i are children[offsets[i]:offsets[i+1]].
         intersection_matrix: (sparse matrix) stores cross-branch intersections of nodes
+        cache: (LRUCache or bool) cache of processed nodes, keyed by the contents of the file and the
+            processing parameters. True uses the default cache in src.cache.CACHE_DIR. Defaults to False, which
+            always processes the file.
 
     methods:
         write: write new processed data in swc format
@@ -35,47 +56,73 @@ class Swc:
 
     """
 
-    def __init__(self, file=None, process=False, reorder=True, Delta=2.0, delta=1.0):
+    def __init__(
+        self, file=None, process=False, reorder=True, Delta=2.0, delta=1.0, cache=False
+    ):
 
         # Store separate timings of all steps.
         self.timings = dict()
-        start = time.time()
-
-        # Read file
+        self._topology = None
         self.file = os.path.abspath(file)
-        position_data, radius_data, conn_data, type_data, preamble = extract_swc(
-            self.file
-        )
-        self.timings["extract_swc"] = time.time() - start
 
-        # Check for correct ordering
-        start = time.time()
-        if reorder:
-            if not (
-                conn_data[0, 1] == -1 and np.all(conn_data[1:, 0] > conn_data[1:, 1])
-            ):
-                position_data, radius_data, conn_data, type_data = reorder_swc(
-                    position_data, radius_data, conn_data, type_data
-                )
-            self.timings["reorder_swc"] = time.time() - start
-
-        # Apply Swc processing
-        if process:
+        # Look up processed nodes in the cache
+        if cache is True:
+            cache = default_swc_cache()
+        if cache:
             start = time.time()
-            if not (reorder):
-                msg = f"Must reorder swc file {file} before processing."
-                warnings.warn(msg, RuntimeWarning, stacklevel=2)
-                position_data, radius_data, conn_data, type_data = reorder_swc(
-                    position_data, radius_data, conn_data, type_data
-                )
-
-            position_data, radius_data, conn_data, type_data = smooth_swc(
-                position_data, radius_data, conn_data, type_data, Delta
+            key = content_hash(
+                [self.file] + SWC_CACHE_SOURCES,
+                process=process,
+                reorder=reorder,
+                Delta=Delta if process else None,
+                delta=delta if process else None,
             )
-            position_data, radius_data, conn_data, type_data = interpolate_swc(
-                position_data, radius_data, conn_data, type_data, delta
+            cached = cache.load(key)
+            self.timings["swc_cache_hit"] = int(cached is not None)
+        else:
+            cached = None
+
+        if cached is not None:
+            position_data = cached["position_data"]
+            radius_data = cached["radius_data"]
+            conn_data = cached["conn_data"]
+            type_data = cached["type_data"]
+            preamble = cached["preamble"].tolist()
+            self.timings["swc_cache"] = time.time() - start
+        else:
+            # Read file
+            start = time.time()
+            position_data, radius_data, conn_data, type_data, preamble = extract_swc(
+                self.file
             )
-            self.timings["process_swc"] = time.time() - start
+            self.timings["extract_swc"] = time.time() - start
+
+            # Check for correct ordering
+            start = time.time()
+            if reorder:
+                if not is_ordered(conn_data):
+                    position_data, radius_data, conn_data, type_data = reorder_swc(
+                        position_data, radius_data, conn_data, type_data
+                    )
+                self.timings["reorder_swc"] = time.time() - start
+
+            # Apply Swc processing
+            if process:
+                start = time.time()
+                if not (reorder):
+                    msg = f"Must reorder swc file {file} before processing."
+                    warnings.warn(msg, RuntimeWarning, stacklevel=2)
+                    position_data, radius_data, conn_data, type_data = reorder_swc(
+                        position_data, radius_data, conn_data, type_data
+                    )
+
+                position_data, radius_data, conn_data, type_data = smooth_swc(
+                    position_data, radius_data, conn_data, type_data, Delta
+                )
+                position_data, radius_data, conn_data, type_data = interpolate_swc(
+                    position_data, radius_data, conn_data, type_data, delta
+                )
+                self.timings["process_swc"] = time.time() - start
 
         # Store data
         self.position_data = position_data
@@ -87,10 +134,28 @@ class Swc:
 
         # Compute branches
         start = time.time()
+        if cached is not None:
+            self.topology.branches = cached["branches"]
         self.initialise_branches()
         self.timings["initialise_branches"] = time.time() - start
         self.Delta = Delta
 
+        # Cache processed nodes
+        if cache and cached is None:
+            arrays = {
+                "position_data": position_data,
+                "radius_data": radius_data,
+                "conn_data": conn_data,
+                "type_data": type_data,
+                "preamble": np.array(preamble, dtype=str),
+                "branches": self.branches,
+            }
+            try:
+                cache.save(key, arrays)
+            except OSError as e:
+                msg = f"Could not cache swc file {file}: {e}"
+                warnings.warn(msg, RuntimeWarning, stacklevel=2)
+
         return None
 
     def write(self, append_clean=True):
@@ -119,13 +184,58 @@ class Swc:
             f.writelines(data)
         return file
 
+    @property
+    def conn_data(self):
+        return self._conn_data
+
+    @conn_data.setter
+    def conn_data(self, conn_data):
+        self._conn_data = conn_data
+        self.invalidate_topology()
+
+    @property
+    def type_data(self):
+        return self._type_data
+
+    @type_data.setter
+    def type_data(self, type_data):
+        self._type_data = type_data
+        self.invalidate_topology()
+
+    @property
+    def topology(self):
+        """Tree topology of the nodes, built on first access."""
+        if self._topology is None:
+            self._topology = Topology(self.conn_data, self.type_data)
+        return self._topology
+
+    def invalidate_topology(self):
+        """Discard the stored topology. Must be called after modifying conn_data or type_data in place."""
+        self._topology = None
+        return None
+
+    @property
+    def children_index(self):
+        return self.topology.offsets, self.topology.children
+
+    @property
+    def branches(self):
+        return self.topology.branches
+
     def initialise_branches(self):
         """Creates branches along the neuron"""
-        self.branches = create_branches(self.conn_data, self.type_data)
+        # Branches are computed once and stored with the topology.
+        _ = self.topology.branches
         return None
 
-    def _build_initial_mesh(self, merge=True):
-        """Produce the inital non-watertight mesh by placing spheres at somas and junctions and tubular meshes along branches"""
+    def _build_initial_mesh(self, merge=True, workers=1):
+        """Produce the inital non-watertight mesh by placing spheres at somas and junctions and tubular meshes along branches
+        Args:
+            merge: (bool) flag to merge the individual meshes into one mesh. If False each sphere and tube is kept in its own layer.
+            workers: (int) number of processes building the tubular meshes. None or 0 uses all cores.
+        Returns:
+            ms: (MeshSet) initial mesh of the cell.
+        """
 
         # Create meshset to store all meshes
         ms = mlab.MeshSet()
@@ -146,40 +256,62 @@ class Swc:
 
         start = time.time()
         # Place spheres at somas
+        parts = []
         for i in range(0, N):
             if t[i] == 1:
-                m = mlab.Mesh(vertex_matrix=p[i] + r[i] * v_S, face_matrix=f_S)
-                ms.add_mesh(m)
+                parts.append((p[i] + r[i] * v_S, f_S))
 
-        # Produce tubular meshes along branches
+        # Collect the nodes of every branch
+        topology = self.topology
         branch_ids = np.unique(b)
+        tasks = []
         for branch in branch_ids:
             if branch > 0:
                 # Get relevent nodes for this branch
-                nodes = np.where(b == branch)[0]
+                nodes = topology.branch_nodes(branch)
                 nodes = np.hstack((c[nodes[0], 1], nodes))
-                n = np.where(c[:, 1] == nodes[-1])[0]
+                n = topology.children_of(nodes[-1])
                 if len(n) > 0:
                     nodes = np.hstack((nodes, n[0]))
-                # Create tubular mesh
-                tendril = Tendril(nodes, self, 0)
-                v, f = tendril.make_mesh(v_S, f_S)
-                # Store mesh
-                m = mlab.Mesh(vertex_matrix=v, face_matrix=f)
-                ms.add_mesh(m)
+                tasks.append((p[nodes], r[nodes], v_S, f_S, 0))
+
+        # Produce tubular meshes along branches
+        if workers == 1 or len(tasks) < 2:
+            parts += [make_tendril_mesh(*task) for task in tasks]
+        else:
+            workers = workers or os.cpu_count()
+            chunksize = max(1, len(tasks) // (4 * workers))
+            with Pool(workers) as pool:
+                parts += pool.starmap(make_tendril_mesh, tasks, chunksize=chunksize)
 
         self.timings["initialising_individual_meshes"] = time.time() - start
 
-        # Merge individual meshes
         if merge:
+            # Merge individual meshes into a single mesh
             start = time.time()
-            print(f"merging {ms.mesh_number()} meshes")
-            ms.generate_by_merging_visible_meshes()
+            print(f"merging {len(parts)} meshes")
+            v, f = concatenate_meshes(parts)
+            ms.add_mesh(mlab.Mesh(vertex_matrix=v, face_matrix=f))
+            # Join coincident vertices, as done when merging layers
+            ms.meshing_remove_duplicate_vertices()
             self.timings["merging_individual_meshes"] = time.time() - start
+        else:
+            # Store each mesh in its own layer
+            for v, f in parts:
+                m = mlab.Mesh(vertex_matrix=v, face_matrix=f)
+                ms.add_mesh(m)
         return ms
 
     def _simplify_mesh(
-        self, ms_alpha, min_faces, dfaces, temp_dir_name, min_r_min=0.05
+        self,
+        ms_alpha,
+        min_faces,
+        dfaces,
+        temp_dir_name,
+        min_r_min=0.05,
+        check_tetgen=False,
+        search="linear",
+        workers=None,
     ):
         """Calls simplfication proceedure on ms_alpha. Simplfication parameters comes from Swc and min_faces,dfaces"""
         start = time.time()
@@ -199,7 +331,17 @@ class Swc:
         r_min = max(min(self.radius_data), min_r_min)
 
         # Call mesh simplification proceedure
-        ms = simplify_mesh(ms_alpha, dfaces, r_min, min_faces, temp_dir_name)
+        ms = simplify_mesh(
+            ms_alpha,
+            dfaces,
+            r_min,
+            min_faces,
+            temp_dir_name,
+            check_tetgen=check_tetgen,
+            search=search,
+            timings=self.timings,
+            workers=workers,
+        )
 
         # Record timings
         self.timings["simplify_mesh"] = time.time() - start
@@ -215,6 +357,11 @@ class Swc:
         min_faces=None,
         dfaces=None,
         save_alpha_mesh=False,
+        workers=1,
+        check_tetgen=False,
+        search="linear",
+        mesh_format="ply",
+        alpha_cache=False,
     ):
         """Compute watertight surface mesh
         Args:
@@ -225,6 +372,12 @@ class Swc:
             output_dir: (string) directory to save the mesh into. Defaults to same location as swc file.
             save: (bool) flag to save the mesh. Defaults to true.
             min_faces: (int) flag to indicate minimum possible number of faces. Defaults to a computed value depending on the length of the cell.
+            workers: (int) number of processes building the tubular meshes of the branches and running parallel simplification attempts. None or 0 uses all cores.
+            check_tetgen: (bool) flag to cross-check self-intersections with TetGen during simplification.
+            search: (string) strategy to search the number of faces during simplification, "linear", "bisection", "galloping" or "parallel".
+            mesh_format: (string) format of the saved meshes, "ply" (binary), "ascii_ply", "npz" or "h5".
+            alpha_cache: (LRUCache or bool) cache of alpha wrapped meshes, keyed by the processed nodes, alpha_fraction
+                and offset. True uses the default cache in src.cache.CACHE_DIR. Defaults to False, which always wraps.
 
         Returns:
             ms: (MeshSet) watertight surface mesh of the cell.
@@ -233,36 +386,89 @@ class Swc:
 
         """
         # Store output information
+        ext = mesh_extension(mesh_format)
         if output_dir is None:
-            name = self.file.replace(".swc", ".ply")
+            name = self.file.replace(".swc", ext)
         else:
             filename = os.path.basename(self.file)
-            name = output_dir + "/" + filename.replace(".swc", ".ply")
+            name = output_dir + "/" + filename.replace(".swc", ext)
+        metadata = {
+            "morphology": os.path.basename(self.file).replace(".swc", ""),
+            "Delta": self.Delta,
+        }
 
         # Get value for alpha_fraction
         if alpha_fraction is None:
             diag = get_bbox_diag(self.position_data)
             alpha_fraction = max(2 * min(self.radius_data) / diag, 5e-4)
 
-        # Compute individual meshes
-        ms = self._build_initial_mesh()
+        offset_fraction = alpha_fraction / 30
 
-        # Apply alpha_wrap filter
-        start = time.time()
-        print(f"Applying alpha wrap to {self.file} with alpha = {alpha_fraction}")
-        ms.generate_alpha_wrap(
-            alpha_fraction=alpha_fraction, offset_fraction=alpha_fraction / 30
-        )
-        self.timings["alpha_wrap"] = time.time() - start
-        ms_alpha = dcp_meshset(ms)
+        # Look up alpha wrapped mesh in the cache
+        if alpha_cache is True:
+            alpha_cache = default_alpha_cache()
+        if alpha_cache:
+            start = time.time()
+            key = content_hash(
+                ALPHA_CACHE_SOURCES,
+                [self.position_data, self.radius_data, self.conn_data, self.type_data],
+                alpha_fraction=alpha_fraction,
+                offset_fraction=offset_fraction,
+            )
+            cached = alpha_cache.load(key)
+            self.timings["alpha_cache_hit"] = int(cached is not None)
+        else:
+            cached = None
+
+        if cached is not None:
+            print(f"Loaded alpha wrap of {self.file} with alpha = {alpha_fraction}")
+            ms = MeshArrays(cached["v"], cached["f"], cached.get("q")).to_meshset()
+            self.timings["alpha_cache"] = time.time() - start
+        else:
+            # Compute individual meshes
+            ms = self._build_initial_mesh(workers=workers)
+
+            # Apply alpha_wrap filter
+            start = time.time()
+            print(f"Applying alpha wrap to {self.file} with alpha = {alpha_fraction}")
+            ms.generate_alpha_wrap(
+                alpha_fraction=alpha_fraction, offset_fraction=offset_fraction
+            )
+            self.timings["alpha_wrap"] = time.time() - start
+        metadata["alpha_fraction"] = alpha_fraction
+        alpha = MeshArrays.from_meshset(ms)
+        if alpha_cache and cached is None:
+            arrays = {"v": alpha.v, "f": alpha.f}
+            if alpha.q is not None:
+                arrays["q"] = alpha.q
+            try:
+                alpha_cache.save(key, arrays)
+            except OSError as e:
+                msg = f"Could not cache alpha wrap of {self.file}: {e}"
+                warnings.warn(msg, RuntimeWarning, stacklevel=2)
         if save_alpha_mesh:
-            ms.save_current_mesh(name.replace(".ply", "_alpha.ply"), binary=False)
+            save_mesh(
+                ms,
+                os.path.splitext(name)[0] + "_alpha" + ext,
+                mesh_format,
+                metadata,
+            )
         # Begin simplification
         if simplify:
-            ms = self._simplify_mesh(ms, min_faces, dfaces, os.path.splitext(name)[0])
+            ms = self._simplify_mesh(
+                ms,
+                min_faces,
+                dfaces,
+                os.path.splitext(name)[0],
+                check_tetgen=check_tetgen,
+                search=search,
+                workers=workers,
+            )
         # Save mesh
         if save:
-            ms.save_current_mesh(name, binary=False)
+            save_mesh(ms, name, mesh_format, {**metadata, **self.timings})
+        ms_alpha = alpha.to_meshset()
+        self.timings["peak_memory_mb"] = peak_memory_mb()
         return ms, name, ms_alpha
 
     def get_length(self):
@@ -282,54 +488,22 @@ class Swc:
 
         # Create surface point cloud from an Swc file
         print("Creating point cloud")
-        segments = []
-        N = len(self.type_data)
 
-        # Iterate through segments, appending spheres or Frustrums to list of segments
-        for i in range(0, N):
-            t = self.type_data[i]
-            if t == 1 or self.conn_data[i, 1] == -1:
-                node = {}
-                node["type"] = t
-                node["position"] = self.position_data[i]
-                node["radius"] = self.radius_data[i]
-                segments.append(Sphere(node, density))
-            else:
-                end = {}
-                end["type"] = t
-                end["position"] = self.position_data[i]
-                end["radius"] = self.radius_data[i]
-                j = self.conn_data[i, 1]
-                start = {}
-                start["type"] = self.type_data[j]
-                start["position"] = self.position_data[j]
-                start["radius"] = self.radius_data[j]
-                segments.append(Frustum(start, end, density))
+        # Spheres for the soma and root nodes, frustums from the parents of other nodes
+        segments = SegmentCloud.from_swc(
+            self.position_data,
+            self.radius_data,
+            self.conn_data,
+            self.type_data,
+            density,
+        )
 
         # Remove all interior points from the segments
         self._check_all_intersect(segments)
 
-        # Begin collecting point cloud
-        point_list = []
-        normal_list = []
-        color_list = []
-        r_min = np.inf
-
-        # Iterate through segments, extracting points
-        for iseg in segments:
-            p, n, c = iseg.output()
-            point_list.append(p)
-            normal_list.append(n)
-            color_list.append(c)
-            if isinstance(iseg, Frustum):
-                r_min = min(r_min, iseg.r_min)
-            elif isinstance(iseg, Sphere):
-                r_min = min(r_min, iseg.r)
-
-        # Concatenate all points
-        points = np.concatenate(point_list, axis=1)
-        normals = np.concatenate(normal_list, axis=1)
-        colors = np.concatenate(color_list, axis=1)
+        # Collect point cloud
+        points, normals, colors = segments.output()
+        r_min = np.min(segments.r_min)
 
         # Store point cloud in a mesh
         m = mlab.Mesh(
@@ -352,11 +526,10 @@ class Swc:
         return ms
 
     def _check_all_intersect(self, seg):
-        """Remove interior points of segments"""
+        """Remove interior points of segments of a SegmentCloud"""
 
         collision_index_pairs = self.aabb(seg)
-        for i, j in collision_index_pairs:
-            self._parent_child_intersect(seg, i, j, remove_close_points=False)
+        seg.remove_interior_points(collision_index_pairs)
 
         return seg
 
@@ -365,64 +538,29 @@ class Swc:
 
         Returns point cloud covering surface of union of the point cloud and surface"""
 
-        # Load segments
-        seg = self.seg
-
-        # Load points
-        points = ms.current_mesh().vertex_matrix().T
-        # Create mask of points that will be kept
-        keep = np.full(points.shape[1], True)
-
-        # Create empty Segment for soma
-        soma = Segment()
-        # Load points, normals and mask into soma
-        soma.points = points
-        ms.compute_normal_per_vertex()
-        soma.normals = ms.current_mesh().vertex_normal_matrix().T
-        soma.keep = keep
-
-        # Set infinite radius
-        soma.r = np.inf
-
-        # Create axis aligned bounding box for soma
-        x = {"min": np.min(points[0, :]), "max": np.max(points[0, :])}
-        y = {"min": np.min(points[1, :]), "max": np.max(points[1, :])}
-        z = {"min": np.min(points[2, :]), "max": np.max(points[2, :])}
-        soma_aabb = x, y, z
-
-        # Remove intersections of soma with other segments
-        j = len(seg) - 1
-        for i, iseg in enumerate(seg):
-            aabb_pair = soma_aabb, iseg.aabb
-            if _aabb_collision(aabb_pair):
-                inner, on, outer, out_near = iseg.intersect(soma)
-                soma.update(outer)
-
-        # Load point cloud mesh
-        pc = self.pc
-        ms.add_mesh(pc.current_mesh())
-
-        # Compute signed distance field of segments to soma
-        ms.compute_scalar_by_distance_from_another_mesh_per_vertex(
-            measuremesh=1, refmesh=0, signeddist=True
+        # Load soma points, keeping those outside every segment
+        soma = ms.current_mesh().vertex_matrix()
+        faces = ms.current_mesh().face_matrix()
+        keep = self.seg.outside(soma.T)
+
+        # Load point cloud
+        points = self.pc.current_mesh().vertex_matrix().T
+
+        # Only points in the axis aligned bounding box of the soma can lie inside it
+        lo, hi = soma.min(axis=0), soma.max(axis=0)
+        in_box = np.flatnonzero(
+            np.all((lo[:, None] <= points) & (points <= hi[:, None]), axis=0)
         )
-        ms.set_current_mesh(1)
-        # Extract signed distance field
-        d = ms.current_mesh().vertex_scalar_array()
-        points = ms.current_mesh().vertex_matrix().T
-        # Keep only points which lie outside soma
-        keep = d > 0
 
-        # Update points
-        for i, flag in enumerate(keep):
-            if ~flag:
-                keep[i] = ~_in_aabb(soma_aabb, points[:, i])
-        points = points[:, keep]
+        # Keep only points which lie outside soma
+        d = TriangleBVH(soma, faces).signed_distance(points[:, in_box].T)
+        outside = np.full(points.shape[1], True)
+        outside[in_box] = d > 0
+        points = points[:, outside]
 
         # Merge meshes
         if includemesh:
-            p, _, _ = soma.output()
-            points = [points, p]
+            points = [points, soma[keep].T]
             points = np.concatenate(points, axis=1)
         ms.clear()
 
@@ -442,7 +580,7 @@ class Swc:
         """Remove collision points in the parent and child nodes.
 
         Args:
-            seg (list): list of segments.
+            seg (SegmentCloud): segments.
             p (int): parent index in `seg`.
             c (int): child index in `seg`.
             remove_close_points (bool, optional): If this is set to True,
@@ -451,26 +589,20 @@ class Swc:
         """
 
         # update parent
-        [_, p_on, p_outer, p_out_near] = seg[c].intersect(seg[p])
-        seg[p].update(np.logical_or(p_on, p_outer))
+        [_, p_on, p_outer, p_out_near] = seg.intersect(c, p)
+        seg.update(p, np.logical_or(p_on, p_outer))
 
         # update child
-        [_, _, c_outer, c_out_near] = seg[p].intersect(seg[c])
-        seg[c].update(c_outer)
+        [_, _, c_outer, c_out_near] = seg.intersect(p, c)
+        seg.update(c, c_outer)
 
         if remove_close_points:
             # get minimum radius
-            r_mins = []
-            for i in [p, c]:
-                if hasattr(seg[i], "r_min"):
-                    r_mins.append(seg[i].r_min)
-                else:
-                    r_mins.append(seg[i].r)
-            r_min = min(r_mins)
+            r_min = min(seg.r_min[p], seg.r_min[c])
 
             # get points and normals
-            p_points, p_normals, _ = seg[p].output(p_out_near)
-            c_points, c_normals, _ = seg[c].output(c_out_near)
+            p_points, p_normals, _ = seg.output(p_out_near, p)
+            c_points, c_normals, _ = seg.output(c_out_near, c)
 
             # compute distance between two point clouds
             p_points = p_points.T.reshape((-1, 1, 3))
@@ -488,14 +620,14 @@ class Swc:
                 c_mask = np.all(mask_far, axis=0)
 
                 # remove parent's points
-                p_keep = dcp(seg[p].keep)
+                p_keep = dcp(seg.keep[seg.point_slice(p)])
                 p_keep[p_keep & p_out_near] = p_mask
-                seg[p].update(p_keep)
+                seg.update(p, p_keep)
 
                 # remove child's points
-                c_keep = dcp(seg[c].keep)
+                c_keep = dcp(seg.keep[seg.point_slice(c)])
                 c_keep[c_keep & c_out_near] = c_mask
-                seg[c].update(c_keep)
+                seg.update(c, c_keep)
 
         return None
 
@@ -503,24 +635,8 @@ class Swc:
     def aabb(seg):
         """Get the aabb collision index pairs."""
 
-        # get all indices
-        indices = [(i, j) for i in range(len(seg) - 1) for j in range(i + 1, len(seg))]
-
-        # get axis-aligned bounding box
-        aabbs = [iseg.aabb for iseg in seg]
-        aabb_pairs = [(aabbs[i], aabbs[j]) for i, j in indices]
-
-        # detect aabb collision
-        with Pool() as p:
-            flags = p.map(_aabb_collision, aabb_pairs)
-        collision_index_pairs = []
-
-        # assemble the collision index pairs
-        for ind, flag in enumerate(flags):
-            if flag:
-                collision_index_pairs.append(indices[ind])
-
-        return collision_index_pairs
+        # Detect collisions of the axis-aligned bounding boxes by sort and sweep
+        return overlapping_boxes(seg.aabbs())
 
 
 def get_bbox_diag(p):
@@ -555,18 +671,14 @@ def extract_swc(file):
 
     """
 
-    position_data = []
-    radius_data = []
-    conn_data = []
-    type_data = []
     preamble = []
+    node_lines = []
+    # Scale factors, recorded together with the index of the first node they apply to.
+    scales = []
 
-    # parse swc file
+    # Sort lines into preamble and node data. Node lines are only collected here,
+    # the numeric block is parsed in bulk below.
     with open(file, "r") as f:
-        first_node = True
-        found_scale = False
-        start_index_0 = False
-        reset_radii = []
         for iline in f:
             line = iline.strip().lower().split()
 
@@ -576,83 +688,146 @@ def extract_swc(file):
                     scale = np.array(line[2:5], dtype=float)
                 else:
                     scale = np.array(line[1:4], dtype=float)
-                found_scale = True
+                scales.append((len(node_lines), scale))
             # read nodes
             elif len(line) == 7 and line[0].isnumeric():
-                # check the parent compartment of the first node
-                if not (found_scale):
-                    scale = np.array([1, 1, 1])
-                    found_scale = True
-
-                if first_node and int(line[6]) != -1:
-                    raise ValueError("Parent of the first node must be -1.")
-                else:
-                    start_index_0 = (int(line[0]) == 0)
-                    first_node = False
-
-                # extract inf
-                if start_index_0:
-                    id = int(line[0])
-                else:
-                    id = int(line[0]) - 1
-                node_type = int(line[1])
-                position = scale * np.array(line[2:5], dtype=float)
-                radius = float(line[5])
-                if start_index_0:
-                    parent_id = int(line[6])
-                else:
-                    parent_id = int(line[6]) - 1
-
-                # check parameters
-                if parent_id < 0:
-                    parent_id = -1
-
-                if parent_id == -1 and node_type != 1:
-                    node_type = -1
-                    msg = "Soma absent. Convert the first point to synthetic soma."
-                    warnings.warn(msg, RuntimeWarning, stacklevel=2)
-
-                if id < 0:
-                    msg = f"Node id {line[0]}: negative compartment ID."
-                    raise ValueError(msg)
-
-                if radius < 1e-4:
-                    msg = f"Node id {line[0]}: radius to small, reset the scale of swc file. Setting to parent radius"
-                    warnings.warn(msg, Warning)
-                    reset_radii.append(id)
-                elif radius < 0:
-                    msg = f"Node id {line[0]}: negative radius."
-                    radius = -radius
-                    warnings.warn(msg, Warning)
-                # if radius < 0.1:
-                #     radius = 0.1
-
-                if node_type < -1 or node_type > 7:
-                    msg = " ".join((f"Node id {line[0]}:", "unknown compartment type."))
-                    warnings.warn(msg, Warning)
-
-                # record info
-                position_data.append(position)
-                type_data.append(node_type)
-                radius_data.append(radius)
-                conn_data.append(np.array([id, parent_id]))
+                node_lines.append(iline)
             else:
                 preamble.append(iline)
 
-    for id in reset_radii:
-        if conn_data[id][1] != -1:
-            radius_data[id] = radius_data[conn_data[id][1]]
-        else:
-            msg = f"File is corrupt at node {id+1}"
-            raise ValueError(msg)
+    # Parse the numeric block in one pass.
+    N = len(node_lines)
+    if N == 0:
+        raise ValueError(f"No nodes found in {file}.")
+    data = np.loadtxt(node_lines, dtype=float, ndmin=2)
+
+    position_data = np.empty((N, 3))
+    radius_data = np.empty(N)
+    conn_data = np.empty((N, 2), dtype=int)
+    type_data = np.empty(N, dtype=int)
+
+    # check the parent compartment of the first node
+    if data[0, 6] != -1:
+        raise ValueError("Parent of the first node must be -1.")
+
+    # extract info, shifting 1-based ids to start at 0
+    raw_ids = data[:, 0].astype(int)
+    start_index_0 = raw_ids[0] == 0
+    offset = 0 if start_index_0 else 1
+    conn_data[:, 0] = raw_ids - offset
+    conn_data[:, 1] = data[:, 6].astype(int) - offset
+    type_data[:] = data[:, 1].astype(int)
+    radius_data[:] = data[:, 5]
+    position_data[:] = data[:, 2:5]
+
+    # apply the scale in effect for each node
+    for k, (first, scale) in enumerate(scales):
+        last = scales[k + 1][0] if k + 1 < len(scales) else N
+        position_data[first:last] *= scale
+
+    # check parameters
+    conn_data[conn_data[:, 1] < 0, 1] = -1
+
+    synthetic_soma = (conn_data[:, 1] == -1) & (type_data != 1)
+    if np.any(synthetic_soma):
+        type_data[synthetic_soma] = -1
+        msg = "Soma absent. Convert the first point to synthetic soma."
+        warnings.warn(msg, RuntimeWarning, stacklevel=2)
+
+    negative_ids = np.flatnonzero(conn_data[:, 0] < 0)
+    if len(negative_ids) > 0:
+        msg = f"Node id {raw_ids[negative_ids[0]]}: negative compartment ID."
+        raise ValueError(msg)
+
+    reset_radii = np.flatnonzero(radius_data < 1e-4)
+    for i in reset_radii:
+        msg = f"Node id {raw_ids[i]}: radius to small, reset the scale of swc file. Setting to parent radius"
+        warnings.warn(msg, Warning)
+
+    for i in np.flatnonzero((type_data < -1) | (type_data > 7)):
+        msg = " ".join((f"Node id {raw_ids[i]}:", "unknown compartment type."))
+        warnings.warn(msg, Warning)
+
+    # reset small radii to the radius of the parent node
+    if len(reset_radii) > 0:
+        ids = conn_data[:, 0]
+        id_order = np.argsort(ids, kind="stable")
+        for i in reset_radii:
+            parent_id = conn_data[i, 1]
+            j = np.searchsorted(ids, parent_id, sorter=id_order)
+            if parent_id == -1 or j == N or ids[id_order[j]] != parent_id:
+                msg = f"File is corrupt at node {conn_data[i, 0]+1}"
+                raise ValueError(msg)
+            radius_data[i] = radius_data[id_order[j]]
 
-    position_data = np.array(position_data)
-    type_data = np.array(type_data)
-    radius_data = np.array(radius_data)
-    conn_data = np.array(conn_data)
     return position_data, radius_data, conn_data, type_data, preamble
 
 
+def _compact_nodes(
+    position_data,
+    radius_data,
+    parents,
+    type_data,
+    removed,
+    num_inserted,
+    inserted_position,
+    inserted_radius,
+):
+    """Writes the nodes of a skeleton after removals and insertions into new arrays.
+    Each remaining node i is preceded by the num_inserted[i] nodes inserted between it and its parent.
+    Args:
+        position_data: (N,3) array of floats of 3d postitions of nodes.
+        radius_data: (N,) array of positive floats of cross-sectional radii of nodes.
+        parents: (N,) array of intergers of the parent of each node.
+        type_data: (N,) array of intergers of the type of each node.
+        removed: (N,) array of booleans of removed nodes.
+        num_inserted: (N,) array of intergers of the number of nodes inserted above each node.
+        inserted_position: (M,3) array of floats of 3d postitions of inserted nodes, ordered by node.
+        inserted_radius: (M,) array of floats of cross-sectional radii of inserted nodes, ordered by node.
+    Returns:
+        position_data: (N',3) array of floats of 3d postitions of nodes.
+        radius_data: (N',) array of positive floats of cross-sectional radii of nodes.
+        conn_data: (N',2) array of intergers of child parent pairs of nodes.
+        type_data: (N',) array of intergers of the type of each node.
+    """
+    type_data = np.asarray(type_data)
+    rows = np.where(removed, 0, num_inserted + 1)
+    end = np.cumsum(rows)
+    start = end - rows
+    new_index = end - 1
+    M = int(end[-1]) if len(end) > 0 else 0
+    keep = np.flatnonzero(~removed)
+
+    new_position_data = np.zeros((M, 3))
+    new_radius_data = np.zeros(M)
+    new_type_data = np.zeros(M, dtype=int)
+    new_conn_data = np.zeros((M, 2), dtype=int)
+
+    new_position_data[new_index[keep]] = position_data[keep]
+    new_radius_data[new_index[keep]] = radius_data[keep]
+    new_type_data[new_index[keep]] = type_data[keep]
+    new_conn_data[:, 0] = np.arange(M)
+    new_conn_data[:, 1] = np.arange(M) - 1
+    root = parents[keep] < 0
+    new_conn_data[new_index[keep[root]], 1] = -1
+
+    # Connect the first node of each run to the parent of the run.
+    first = start[keep[~root]]
+    new_conn_data[first, 1] = new_index[parents[keep[~root]]]
+
+    # Copy the inserted nodes into place.
+    grown = np.flatnonzero(num_inserted > 0)
+    counts = num_inserted[grown]
+    ins_rows = np.repeat(start[grown], counts) + (
+        np.arange(len(inserted_radius)) - np.repeat(np.cumsum(counts) - counts, counts)
+    )
+    new_position_data[ins_rows] = inserted_position
+    new_radius_data[ins_rows] = inserted_radius
+    new_type_data[ins_rows] = np.repeat(type_data[grown], counts)
+
+    return new_position_data, new_radius_data, new_conn_data, new_type_data
+
+
 def add_node_between_parent(
     i, num_points, position_data, radius_data, conn_data, type_data
 ):
@@ -774,6 +949,10 @@ def node_merge_with_parent(i, position_data, radius_data, conn_data, type_data):
 
 def smooth_swc(position_data, radius_data, conn_data, type_data, Delta):
     """Smooths the swc file, by iterating through it and merging and inserting nodes
+
+    Merges and insertions are marked during a single pass over the nodes and the new arrays
+    are written in one compaction step at the end.
+
     Args:
         position_data: (N,3) array of floats of 3d postitions of nodes.
         radius_data: (N,) array of positive floats of cross-sectional radii of nodes.
@@ -789,78 +968,88 @@ def smooth_swc(position_data, radius_data, conn_data, type_data, Delta):
 
     """
     N = len(position_data)
+    position_data = np.array(position_data, dtype=float)
+    radius_data = np.array(radius_data, dtype=float)
+    parents = np.array(conn_data[:, 1], dtype=int)
+    offsets, children = children_index(conn_data)
+
     # For efficiency, number of children are calculated once, and then updated as nodes are inserted/added.
-    num_children = [int(sum(conn_data[:, 1] == i)) for i in range(0, N)]
-    i = 0
-    while i < N:
-        p = position_data[i]
+    num_children = np.bincount(parents[parents >= 0], minlength=N).tolist()
+
+    # Record merged nodes and the nodes inserted between each node and its parent.
+    removed = np.zeros(N, dtype=bool)
+    num_inserted = np.zeros(N, dtype=int)
+    inserted_position = np.zeros((3 * N, 3))
+    inserted_radius = np.zeros(3 * N)
+    n_inserted = 0
+
+    types = np.asarray(type_data).tolist()
+    for i in range(0, N):
+        parent_id = parents[i]
         # Check node is not a soma node or direct child of soma node.
+        if parent_id < 0 or types[i] == 1 or types[parent_id] == 1:
+            continue
+
+        p = position_data[i]
+        q = position_data[parent_id]
+        r = radius_data[i]
+        R = radius_data[parent_id]
+        dist = norm(p - q)
+        radius_ratio_flag = r / R > 2 or R / r > 2
+        num_siblings = num_children[parent_id] - 1
+        num_points = 0
+        merge = False
         if (
-            conn_data[i][1] >= 0
-            and type_data[i] != 1
-            and type_data[conn_data[i][1]] != 1
+            dist < Delta
+            and num_children[i] == 1
+            and num_siblings == 0
+            and not (radius_ratio_flag)
         ):
-            parent_id = conn_data[i][1]
-            q = position_data[parent_id]
-            r = radius_data[i]
-            R = radius_data[parent_id]
-            radius_ratio_flag = r / R > 2 or R / r > 2
-            num_siblings = num_children[parent_id] - 1
-            if (
-                norm(p - q) < Delta
-                and num_children[i] == 1
-                and num_siblings == 0
-                and not (radius_ratio_flag)
-            ):
-                # Merge nodes
-                position_data, radius_data, conn_data, type_data = (
-                    node_merge_with_parent(
-                        i, position_data, radius_data, conn_data, type_data
-                    )
-                )
-                N = N - 1
-                num_children.pop(i)
-            elif radius_ratio_flag:
-                # Add interpolated nodes as radii change drastically
-                num_points = int(np.min([3, np.floor(np.max([r / R, R / r]))]))
-                position_data, radius_data, conn_data, type_data = (
-                    add_node_between_parent(
-                        i, num_points, position_data, radius_data, conn_data, type_data
-                    )
-                )
-                i = i + num_points + 1
-                N = N + num_points
-                for j in range(0, num_points):
-                    num_children.insert(i + j, 1)
-
-            elif norm(p - q) > 2 * Delta:
-                # Add interpolated nodes as nodes too far apart
-                num_points = int(np.min([3, np.floor(norm(p - q) / Delta - 1)]))
-                position_data, radius_data, conn_data, type_data = (
-                    add_node_between_parent(
-                        i, num_points, position_data, radius_data, conn_data, type_data
-                    )
-                )
-                i = i + num_points + 1
-                N = N + num_points
-                for j in range(0, num_points):
-                    num_children.insert(i + j, 1)
-
-            elif norm(p - q) < 1e-5:
-                # Nodes are too close, must merge nodes.
-                position_data, radius_data, conn_data, type_data = (
-                    node_merge_with_parent(
-                        i, position_data, radius_data, conn_data, type_data
-                    )
-                )
-                N = N - 1
-                num_children.pop(i)
+            merge = True
+        elif radius_ratio_flag:
+            # Add interpolated nodes as radii change drastically
+            num_points = int(min(3, np.floor(max(r / R, R / r))))
+        elif dist > 2 * Delta:
+            # Add interpolated nodes as nodes too far apart
+            num_points = int(min(3, np.floor(dist / Delta - 1)))
+        elif dist < 1e-5:
+            # Nodes are too close, must merge nodes.
+            merge = True
 
-            else:
-                i += 1
-        else:
-            i += 1
-    return position_data, radius_data, conn_data, type_data
+        if merge:
+            # Merge node into its parent, and pass its children on to the parent.
+            position_data[parent_id] = (p + q) / 2
+            radius_data[parent_id] = np.sqrt(r * R)
+            parents[children[offsets[i] : offsets[i + 1]]] = parent_id
+            removed[i] = True
+        elif num_points > 0:
+            for j in range(0, num_points):
+                l = (j + 1) / (num_points + 1)
+                inserted_position[n_inserted + j] = (1 - l) * q + l * p
+                inserted_radius[n_inserted + j] = R ** ((1 - l)) * r**l
+            n_inserted += num_points
+            num_inserted[i] = num_points
+
+            # The child counts of the node and of the following nodes are shifted
+            # by the insertion, as in the original node by node implementation.
+            shifted = [num_children[i]] + [
+                num_children[i + j] if i + j < N else 1
+                for j in range(1, num_points + 1)
+            ]
+            num_children[i] = shifted[num_points]
+            for j in range(1, min(num_points, N - 1 - i) + 1):
+                num_children[i + j] = 1
+
+    return _compact_nodes(
+        position_data,
+        radius_data,
+        parents,
+        type_data,
+        removed,
+        num_inserted,
+        inserted_position[:n_inserted],
+        inserted_radius[:n_inserted],
+    )
 
 
 def interpolate_swc(position_data, radius_data, conn_data, type_data, delta):
@@ -869,6 +1058,8 @@ def interpolate_swc(position_data, radius_data, conn_data, type_data, delta):
      - adjacent nodes are more than delta apart
      - two nodes each with multiple children would not intersect each other when represented as spheres.
 
+    The number of insertions for every node is computed up front and the densified skeleton is written in one allocation.
+
     Args:
         position_data: (N,3) array of floats of 3d postitions of nodes.
         radius_data: (N,) array of positive floats of cross-sectional radii of nodes.
@@ -884,42 +1075,55 @@ def interpolate_swc(position_data, radius_data, conn_data, type_data, delta):
 
     """
 
-    i = -1
     N = len(position_data)
-    num_children = [int(sum(conn_data[:, 1] == i)) for i in range(0, N)]
-    while i < N - 1:
-        i = i + 1
-        if conn_data[i][1] != -1 and type_data[i] != 1:
-            p = position_data[i]
-            parent_id = conn_data[i][1]
-            q = position_data[parent_id]
-            r_min = min([radius_data[i], radius_data[parent_id]])
-            if norm(p - q) >= delta or (
-                norm(p - q) >= r_min
-                and num_children[i] > 1
-                and num_children[parent_id] > 1
-            ):
-                "Add interpolated nodes"
-                num_points = max([int(np.floor(norm(p - q) / delta - 1)), 1])
-                position_data, radius_data, conn_data, type_data = (
-                    add_node_between_parent(
-                        i, num_points, position_data, radius_data, conn_data, type_data
-                    )
-                )
-                for j in range(0, num_points):
-                    num_children.insert(i + j, 1)
-                i = i + num_points
-                N = N + num_points
-
-    return position_data, radius_data, conn_data, type_data
+    type_data = np.asarray(type_data)
+    parents = np.array(conn_data[:, 1], dtype=int)
+    num_children = np.bincount(parents[parents >= 0], minlength=N)
+
+    # Find the nodes requiring insertions between them and their parent.
+    nodes = np.flatnonzero((parents != -1) & (type_data != 1))
+    p = position_data[nodes]
+    q = position_data[parents[nodes]]
+    dist = norm(p - q, axis=1)
+    r_min = np.minimum(radius_data[nodes], radius_data[parents[nodes]])
+    insert = (dist >= delta) | (
+        (dist >= r_min)
+        & (num_children[nodes] > 1)
+        & (num_children[parents[nodes]] > 1)
+    )
+    nodes = nodes[insert]
+    num_points = np.maximum(np.floor(dist[insert] / delta - 1).astype(int), 1)
+    num_inserted = np.zeros(N, dtype=int)
+    num_inserted[nodes] = num_points
+
+    # Add interpolated nodes
+    node = np.repeat(nodes, num_points)
+    k = np.repeat(num_points, num_points)
+    j = np.arange(len(node)) - np.repeat(np.cumsum(num_points) - num_points, num_points)
+    l = ((j + 1) / (k + 1)).reshape((-1, 1))
+    inserted_position = (1 - l) * position_data[parents[node]] + l * position_data[node]
+    l = l.reshape(-1)
+    inserted_radius = radius_data[parents[node]] ** ((1 - l)) * radius_data[node] ** l
+
+    return _compact_nodes(
+        position_data,
+        radius_data,
+        parents,
+        type_data,
+        np.zeros(N, dtype=bool),
+        num_inserted,
+        inserted_position,
+        inserted_radius,
+    )
 
 
-def create_branches(conn_data, type_data):
+def create_branches(conn_data, type_data, index=None):
     """Passes through the swc file and returns a classification of all nodes into branches or junctions.
     A junction node i will have branches[i] = -1. A node i in branche j will have branches[i] = j.
     Args:
         conn_data: (N,2) array of intergers of child parent pairs of nodes.
         type_data: (N,) array of intergers of the type of each node.
+        index: (tuple) optional children index (offsets, children) of the nodes, as returned by children_index.
     Returns:
         branches: (N,) array of intergers representing the segment to which each node belongs.
     """
@@ -927,33 +1131,41 @@ def create_branches(conn_data, type_data):
     N = len(conn_data)
     branches = np.zeros(N, dtype=int)
     id = 1
-    children = [np.where(conn_data[:, 1] == i)[0] for i in range(0, N)]
-    num_children = [len(c) for c in children]
-    junction_ind = [
-        i
-        for (i, n) in enumerate(num_children)
-        if n > 1 or type_data[i] == 1 or type_data[i] == -1
-    ]
-    i = 0
-    while i < N:
-        if i in junction_ind:
-            branches[i] = -1
-        elif branches[i] == 0:
+    if index is None:
+        index = children_index(conn_data)
+    offsets, children = index
+    num_children = np.diff(offsets)
+    is_junction = (num_children > 1) | (type_data == 1) | (type_data == -1)
+
+    # Plain lists make the scalar lookups in the loop below cheap.
+    offsets_list = offsets.tolist()
+    children_list = children.tolist()
+    num_children = num_children.tolist()
+    is_junction = is_junction.tolist()
+    labels = [0] * N
+    for i in range(0, N):
+        if is_junction[i]:
+            labels[i] = -1
+        elif labels[i] == 0:
             j = i
-            while branches[j] == 0 and num_children[j] <= 1:
-                branches[j] = id
+            while labels[j] == 0 and num_children[j] <= 1:
+                labels[j] = id
                 if num_children[j] == 1:
-                    j = children[j][0]
+                    j = children_list[offsets_list[j]]
                 else:
                     break
             id += 1
-        i += 1
+    branches[:] = labels
 
     return branches
 
 
 def reorder_swc(position_data, radius_data, conn_data, type_data):
     """Reorders nodes to ensure parents always come before children.
+    Node ids are remapped to the new row indices.
+
+    Nodes are first sorted by id. If parents still do not come before children, the nodes are
+    put in depth first preorder instead.
 
     Args:
         position_data: (N,3) array of floats of 3d postitions of nodes.
@@ -969,72 +1181,50 @@ def reorder_swc(position_data, radius_data, conn_data, type_data):
 
     """
     print("Reordering swc")
-    # Identify source node
     N = len(conn_data)
-    nodes = conn_data[:, 0]
-    permutation = np.argsort(nodes)
+
+    # Sort nodes by id
+    permutation = np.argsort(conn_data[:, 0], kind="stable")
+    ids = conn_data[permutation, 0]
+    parent_ids = conn_data[permutation, 1]
+    duplicates = np.flatnonzero(ids[1:] == ids[:-1])
+    if len(duplicates) > 0:
+        msg = f"Node id {ids[duplicates[0]]+1}: duplicate compartment ID."
+        raise ValueError(msg)
+
+    # Map parent ids to rows
+    parents = np.minimum(np.searchsorted(ids, parent_ids), N - 1)
+    missing = np.flatnonzero((parent_ids != -1) & (ids[parents] != parent_ids))
+    if len(missing) > 0:
+        msg = f"Node id {ids[missing[0]]+1}: parent {parent_ids[missing[0]]+1} not found."
+        raise ValueError(msg)
+    parents[parent_ids == -1] = -1
+
+    # Fall back to depth first order when sorting by id is not enough
+    if parents[0] != -1 or np.any(parents >= np.arange(N)):
+        order = preorder(parents)
+        new_index = np.empty(N, dtype=int)
+        new_index[order] = np.arange(N)
+        parents = np.where(parents[order] >= 0, new_index[parents[order]], -1)
+        permutation = permutation[order]
+
     position_data = position_data[permutation]
     type_data = type_data[permutation]
     radius_data = radius_data[permutation]
-    conn_data = conn_data[permutation]
+    conn_data = np.stack((np.arange(N), parents), axis=1)
     return position_data, radius_data, conn_data, type_data
 
 
-def reorder(start_node, set, nodes, parents, permutation):
-    """A recursive function to build the permutation to reorder the swc file.
+def is_ordered(conn_data):
+    """Checks that node ids match row indices and parents come before children.
     Args:
-        start_node: (int) node under consideration. It has already been correctly ordered.
-        set: (int) the number of nodes already considered. This is also the value, permutation[set] = start_node.
-        nodes: (N,) array of intergers of the node indices.
-        parents: (N,) array of intergers of the parent node indices.
-        permutation: (N,) array of intergers representing a permutation in S_n.
+        conn_data: (N,2) array of intergers of child parent pairs of nodes.
     Returns:
-        permutation: Updated (N,) array of intergers representing a permutation in S_n.
-        set: (int) Updated number of nodes already considered.
+        flag: (bool)
     """
-    # Find children
-    children = np.where(parents == start_node)[0]
-    for i in range(0, len(children)):
-        set = set + 1
-        permutation[set] = children[i]
-        permutation, set = reorder(children[i], set, nodes, parents, permutation)
-    return permutation, set
-
-
-def _in_aabb(aabb, p):
-    """Detect if point p is in Axis-aligne Bouding Box aabb"""
-    xa, ya, za = aabb
-    x = p[0]
-    y = p[1]
-    z = p[2]
-
-    return (
-        xa["min"] <= x
-        and x <= xa["max"]
-        and ya["min"] <= y
-        and y <= ya["max"]
-        and za["min"] <= z
-        and z <= za["max"]
+    N = len(conn_data)
+    return bool(
+        conn_data[0, 1] == -1
+        and np.all(conn_data[:, 0] == np.arange(N))
+        and np.all(conn_data[1:, 1] < conn_data[1:, 0])
     )
-
-
-def _aabb_collision(aabb_pair):
-    """Detect "Axis-Aligned Bounding Box" collision."""
-
-    xa, ya, za = aabb_pair[0]
-    xb, yb, zb = aabb_pair[1]
-
-    # no collision
-    if (
-        xa["max"] <= xb["min"]
-        or xa["min"] >= xb["max"]
-        or ya["max"] <= yb["min"]
-        or ya["min"] >= yb["max"]
-        or za["max"] <= zb["min"]
-        or za["min"] >= zb["max"]
-    ):
-        return False
-
-    # found collision
-    else:
-        return True
@@ -23,6 +23,19 @@ def make_faces(n, N):
     return f
 
 
+def make_tube_faces(n, steps):
+    """Create cylindrical faces along a whole tubular mesh at once.
+
+    Args:
+        n: (int) number of vertices along each disk along the mesh
+        steps: (int) number of disks along the mesh
+
+    """
+    f = make_faces(n, n).astype(int)
+    offsets = n * np.arange(0, steps - 1, 1)
+    return (f[np.newaxis, :, :] + offsets[:, np.newaxis, np.newaxis]).reshape((-1, 3))
+
+
 def make_initial_vertices(tendril, n):
     """Make an initial disk for the tubular mesh
 
@@ -74,6 +87,71 @@ def make_rotation_matix(dir1, dir2):
     return R
 
 
+def make_rotation_matrices(dir1, dir2):
+    """Create rotation matrices R[i] which send dir1[i] to dir2[i], as in make_rotation_matix.
+    Args:
+        dir1: (m,3) numpy.array
+        dir2: (m,3) numpy.array
+    Returns:
+        R: (m,3,3) numpy.array
+    """
+
+    # Normalise directions
+    dir1 = dir1 / norm(dir1, axis=1, keepdims=True)
+    dir2 = dir2 / norm(dir2, axis=1, keepdims=True)
+
+    u = np.cross(dir1, dir2)
+    s = norm(u, axis=1)
+    mask = np.abs(s) >= 0.0000001
+    u[mask] = u[mask] / s[mask, np.newaxis]
+    c = np.einsum("ij,ij->i", dir1, dir2)
+
+    K = np.zeros((len(u), 3, 3))
+    K[:, 0, 1] = -u[:, 2]
+    K[:, 0, 2] = u[:, 1]
+    K[:, 1, 0] = u[:, 2]
+    K[:, 1, 2] = -u[:, 0]
+    K[:, 2, 0] = -u[:, 1]
+    K[:, 2, 1] = u[:, 0]
+    Kout = u[:, :, np.newaxis] * u[:, np.newaxis, :]
+    R = (
+        c[:, np.newaxis, np.newaxis] * np.eye(3)
+        + s[:, np.newaxis, np.newaxis] * K
+        + (1 - c)[:, np.newaxis, np.newaxis] * Kout
+    )
+    return R
+
+
+def compose_rotations(R):
+    """Cumulative products M[i] = R[i] @ R[i-1] @ ... @ R[0], using a parallel prefix scan.
+    Args:
+        R: (m,3,3) numpy.array
+    Returns:
+        M: (m,3,3) numpy.array
+    """
+    M = np.array(R, copy=True)
+    shift = 1
+    while shift < len(M):
+        M[shift:] = np.matmul(M[shift:], M[:-shift])
+        shift *= 2
+    return M
+
+
+def make_tendril_mesh(p, r, v_S, f_S, Delta=0):
+    """Makes the tubular mesh of a branch from plain arrays, so that it can be run in a worker process.
+    Args:
+        p: (n,3) array of node positions along the branch
+        r: (n,) array of node radii along the branch
+        v_S: (N,3) array of vertices from a unit sphere mesh.
+        f_S: (M,3) array of faces from a unit sphere mesh.
+        Delta: (float) relevent distance for computing spline
+    Returns:
+        v: (K,3) array of vertices of the tubular mesh.
+        f: (L,3) array of faces of the tubular mesh.
+    """
+    return Tendril.from_data(p, r, Delta).make_mesh(v_S, f_S)
+
+
 class Tendril:
     """Class representing a single branch of a neuron swc file. Computes a tubular mesh
 
@@ -83,9 +161,10 @@ class Tendril:
         Delta: (float) relevent distance for computing spline
 
     methods:
+        from_data: create a Tendril from node positions and radii
         make_splines: create splines to interpolate nodes position and radii
-        make_mesh: create tubular mesh
-        transport: move points along the branch
+        make_mesh: create tubular mesh, sweeping a disk along all steps at once
+        transport: move points along the branch between two steps
     """
 
     def __init__(self, nodes, swc, Delta):
@@ -96,6 +175,22 @@ class Tendril:
         self.make_splines()
         return None
 
+    @classmethod
+    def from_data(cls, p, r, Delta):
+        """Creates a Tendril from the positions and radii of its nodes
+        Args:
+            p: (n,3) array of node positions along the branch
+            r: (n,) array of node radii along the branch
+            Delta: (float) relevent distance for computing spline
+        """
+        tendril = cls.__new__(cls)
+        tendril.nodes = None
+        tendril.p = p
+        tendril.r = r
+        tendril.Delta = Delta
+        tendril.make_splines()
+        return tendril
+
     def make_splines(self):
         """Make splines to interpolate position and radii of nodes"""
         n = len(self.p)
@@ -143,18 +238,25 @@ class Tendril:
             )
         )
 
-        # Transport vertices along and create faces.
-        v = [v0]
-        f = []
+        # Evaluate the splines at all steps at once
         t = np.linspace(0, 1, steps)
-        for i in range(1, steps):
-            v1 = self.transport(t[i - 1], t[i], v0)
-            v0 = v1.astype(float)
-            f1 = make_faces(n, i * n)
-            f.append(f1)
-            v.append(v1)
-
-        v = np.hstack(v).T
+        p = self.skeleton(x=t, nu=0)
+        d = self.skeleton(x=t, nu=1)
+        r = np.clip(self.radius(x=t), min(self.r), max(self.r))
+
+        # Compose the changes of direction between steps into one frame per step
+        frames = np.empty((steps, 3, 3))
+        frames[0] = np.eye(3)
+        frames[1:] = compose_rotations(make_rotation_matrices(d[:-1], d[1:]))
+
+        # Transport the unit disk along the branch and create faces.
+        unit_disk = (v0 - p[0].reshape((3, 1))) / r[0]
+        v = r[:, np.newaxis, np.newaxis] * np.matmul(frames, unit_disk) + p[
+            :, :, np.newaxis
+        ]
+        v[0] = v0
+        v = v.transpose((0, 2, 1)).reshape((-1, 3))
+        f = [make_tube_faces(n, steps)]
 
         # Add spherical caps
         start = self.skeleton(x=0)
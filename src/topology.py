@@ -0,0 +1,173 @@
+import numpy as np
+from functools import cached_property
+
+
+def children_index(conn_data):
+    """Builds a compressed index of the children of every node.
+    Args:
+        conn_data: (N,2) array of intergers of child parent pairs of nodes.
+    Returns:
+        offsets: (N+1,) array of intergers. The children of node i are children[offsets[i]:offsets[i+1]].
+        children: (M,) array of intergers of child nodes, grouped by parent.
+    """
+    parents = np.asarray(conn_data)[:, 1]
+    N = len(parents)
+    has_parent = np.flatnonzero(parents >= 0)
+    children = has_parent[np.argsort(parents[has_parent], kind="stable")]
+    offsets = np.zeros(N + 1, dtype=int)
+    offsets[1:] = np.cumsum(np.bincount(parents[has_parent], minlength=N))
+    return offsets, children
+
+
+def path_sum(parents, weights):
+    """Sums weights along the path from every node to its root by pointer jumping.
+    No assumption is made on the node order.
+    Args:
+        parents: (N,) array of intergers of the parent of each node, -1 for roots.
+        weights: (N,) array of weights of each node.
+    Returns:
+        sums: (N,) array of the sum of the weights of each node and all its ancestors.
+    Raises:
+        ValueError: the parents do not form a tree.
+    """
+    parents = np.asarray(parents)
+    N = len(parents)
+    if np.any(parents >= N) or np.any(parents < -1):
+        raise ValueError("Parent index out of range.")
+
+    # sums[i] holds the weights between node i and ancestor[i], excluding the ancestor.
+    sums = np.array(weights, copy=True)
+    ancestor = np.array(parents, copy=True)
+    for _ in range(0, int(np.ceil(np.log2(max(N, 2)))) + 1):
+        active = np.flatnonzero(ancestor >= 0)
+        if len(active) == 0:
+            break
+        sums[active] = sums[active] + sums[ancestor[active]]
+        ancestor[active] = ancestor[ancestor[active]]
+    if np.any(ancestor >= 0):
+        raise ValueError("Nodes do not form a tree, found a cycle.")
+    return sums
+
+
+def tree_depth(parents):
+    """Computes the depth of every node, without any assumption on the node order.
+    Args:
+        parents: (N,) array of intergers of the parent of each node, -1 for roots.
+    Returns:
+        depth: (N,) array of intergers of the number of edges between each node and its root.
+    """
+    parents = np.asarray(parents)
+    return path_sum(parents, (parents >= 0).astype(int))
+
+
+def preorder(parents, topology=None):
+    """Computes the depth first preorder of the nodes, visiting children in increasing index order.
+    Args:
+        parents: (N,) array of intergers of the parent of each node, -1 for roots.
+        topology: (Topology) optional topology of the nodes.
+    Returns:
+        order: (N,) array of intergers, the nodes in preorder.
+    """
+    if topology is None:
+        topology = Topology(np.stack((np.arange(len(parents)), parents), axis=1))
+    N = len(topology)
+    size = topology.subtree_size
+
+    # Each node is placed after its parent and the subtrees of its earlier siblings.
+    child_size = np.cumsum(size[topology.children])
+    group_start = np.repeat(
+        np.append(0, child_size)[topology.offsets[:-1]], topology.num_children
+    )
+    offset = np.zeros(N, dtype=int)
+    offset[topology.children] = 1 + child_size - size[topology.children] - group_start
+    roots = np.flatnonzero(topology.parents < 0)
+    offset[roots] = np.cumsum(size[roots]) - size[roots]
+
+    position = path_sum(topology.parents, offset)
+    order = np.empty(N, dtype=int)
+    order[position] = np.arange(N)
+    return order
+
+
+class Topology:
+    """Compressed tree topology of an swc skeleton.
+
+    Quantities other than the parents and children index are computed on first access.
+
+    attributes:
+        parents: (N,) array of the parent of each node, -1 for roots.
+        offsets: (N+1,) array, the children of node i are children[offsets[i]:offsets[i+1]].
+        children: (M,) array of child nodes, grouped by parent.
+        num_children: (N,) array of the number of children of each node.
+        depth: (N,) array of the number of edges between each node and its root.
+        subtree_size: (N,) array of the number of nodes in the subtree rooted at each node.
+        branches: (N,) array of the branch of each node, -1 for junctions, as in create_branches.
+
+    methods:
+        children_of: children of a node.
+        parent_of: parent of a node.
+        branch_nodes: nodes belonging to a branch.
+    """
+
+    def __init__(self, conn_data, type_data=None):
+        self.parents = np.array(conn_data[:, 1], dtype=int)
+        self.offsets, self.children = children_index(conn_data)
+        self.type_data = type_data
+        self._conn_data = conn_data
+        return None
+
+    def __len__(self):
+        return len(self.parents)
+
+    def children_of(self, i):
+        """Returns the children of node i."""
+        return self.children[self.offsets[i] : self.offsets[i + 1]]
+
+    def parent_of(self, i):
+        """Returns the parent of node i, -1 for a root."""
+        return self.parents[i]
+
+    @cached_property
+    def num_children(self):
+        return np.diff(self.offsets)
+
+    @cached_property
+    def depth(self):
+        return tree_depth(self.parents)
+
+    @cached_property
+    def subtree_size(self):
+        # Accumulate sizes level by level, from the deepest nodes upwards.
+        depth = self.depth
+        order = np.argsort(depth, kind="stable")
+        starts = np.searchsorted(depth[order], np.arange(depth.max(initial=0) + 2))
+        size = np.ones(len(self.parents), dtype=int)
+        for d in range(len(starts) - 2, 0, -1):
+            nodes = order[starts[d] : starts[d + 1]]
+            np.add.at(size, self.parents[nodes], size[nodes])
+        return size
+
+    @cached_property
+    def branches(self):
+        from .swc import create_branches
+
+        if self.type_data is None:
+            raise ValueError("Node types are needed to compute branches.")
+        return create_branches(
+            self._conn_data, self.type_data, (self.offsets, self.children)
+        )
+
+    @cached_property
+    def _branch_index(self):
+        # Group nodes by branch, keeping nodes of a branch in increasing order.
+        branches = self.branches
+        order = np.argsort(branches, kind="stable")
+        labels, starts = np.unique(branches[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        return order, dict(zip(labels.tolist(), zip(starts.tolist(), ends.tolist())))
+
+    def branch_nodes(self, branch):
+        """Returns the nodes of a branch in increasing order."""
+        order, ranges = self._branch_index
+        start, end = ranges.get(int(branch), (0, 0))
+        return order[start:end]
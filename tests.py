@@ -1,7 +1,31 @@
 import pytest
-from src import Swc, call_tetgen, is_watertight
+from src import Swc, call_tetgen, read_tetgen, is_watertight
+from src.swc import extract_swc, reorder_swc, is_ordered
+from src.bvh import (
+    has_self_intersections,
+    is_edge_manifold,
+    overlapping_boxes,
+    triangles_intersect,
+    TriangleBVH,
+    closest_points_on_triangles,
+)
+from src.mesh_processing import (
+    search_smallest,
+    simplify_mesh,
+    MeshArrays,
+    concatenate_meshes,
+)
+from src import mesh_processing
+from src.mesh_io import save_mesh, load_mesh, load_metadata, is_mesh_file
+from src.get_mesh_stats import shape_measures, surface_distances
+from src.segments import Sphere, Frustum, SegmentCloud
+from src.topology import Topology
+from src.tendril import Tendril, make_initial_vertices, make_faces, make_tendril_mesh
+from src.cache import content_hash, cache_file, load_array, save_array, LRUCache
 import numpy
 import os
+import subprocess
+import sys
 import pymeshlab as mlab
 
 def test_tetgen():
@@ -11,6 +35,36 @@ def test_tetgen():
     output = call_tetgen(file, args="-d")
     assert "No faces are intersecting." in output
 
+def test_read_tetgen(tmp_path):
+    """Test 1-based TetGen meshes are read with 0-based elements and cached."""
+
+    tet_file = str(tmp_path / "test.1")
+    with open(tet_file + ".node", "w") as f:
+        f.write("# Node count, 3 dim, no attribute, no boundary marker\n")
+        f.write("5  3  0  0\n")
+        f.write("1  0.0 0.0 0.0\n2  1.0 0.0 0.0\n3  0.0 1.0 0.0\n")
+        f.write("4  0.0 0.0 1.0\n5  1.0 1.0 1.0\n")
+        f.write("# Generated by tetgen -k\n")
+    with open(tet_file + ".ele", "w") as f:
+        f.write("2  4  0\n")
+        f.write("1  1 2 3 4\n2  2 3 4 5\n")
+        f.write("# Generated by tetgen -k\n")
+    nodes, elements = read_tetgen(tet_file)
+    assert nodes.shape == (5, 3)
+    assert numpy.array_equal(nodes[4], [1.0, 1.0, 1.0])
+    assert numpy.array_equal(elements, [[0, 1, 2, 3], [1, 2, 3, 4]])
+
+    # The first read writes the cache, the second memory-maps it
+    nodes_cached, elements_cached = read_tetgen(tet_file, cache=True)
+    assert os.path.isfile(tet_file + ".node.npy")
+    assert os.path.isfile(tet_file + ".ele.npy")
+    nodes_cached, elements_cached = read_tetgen(tet_file, cache=True)
+    assert isinstance(nodes_cached, numpy.memmap)
+    assert isinstance(elements_cached, numpy.memmap)
+    assert numpy.array_equal(nodes_cached, nodes)
+    assert numpy.array_equal(elements_cached, elements)
+
+
 def test_watertightness_check():
     """Test watertightness is verified."""
 
@@ -20,6 +74,317 @@ def test_watertightness_check():
     assert is_watertight(ms)
 
 
+def test_self_intersection_check():
+    """Test self-intersections of overlapping spheres are found."""
+
+    ms = mlab.MeshSet()
+    ms.create_sphere(radius=1, subdiv=2)
+    v = ms.current_mesh().vertex_matrix()
+    f = ms.current_mesh().face_matrix()
+    assert not has_self_intersections(v, f)
+    assert is_edge_manifold(f)
+
+    # Two overlapping spheres form a closed but self-intersecting surface
+    v2 = numpy.vstack((v, v + [0.5, 0.3, 0.1]))
+    f2 = numpy.vstack((f, f + len(v)))
+    assert has_self_intersections(v2, f2)
+    assert is_edge_manifold(f2)
+    assert not is_watertight(mlab.Mesh(vertex_matrix=v2, face_matrix=f2))
+
+
+def test_coplanar_triangles():
+    """Test coplanar and touching triangles are checked for overlaps."""
+
+    v = numpy.array(
+        [
+            [0, 0, 0],
+            [2, 0, 0],
+            [0, 2, 0],
+            [1, 1, 0],
+            [3, 1, 0],
+            [1, 3, 0],
+            [0.5, 0.5, 0],
+            [2, 2, 0],
+            [0.5, 0.5, 1],
+            [1, 0.5, 1],
+            [1, -2, 0],
+            [-2, -2, 0],
+            [-2, 1, 0],
+            [-3, -1, 0],
+        ],
+        dtype=float,
+    )
+    f = numpy.array(
+        [
+            [0, 1, 2],  # 0
+            [3, 4, 5],  # 1 overlaps 0 in the plane, touching its edge at vertex 3
+            [6, 1, 2],  # 2 folded onto 0 across a shared edge
+            [1, 7, 2],  # 3 beside 0 across a shared edge
+            [6, 8, 9],  # 4 above 0, touching it at vertex 6
+            [0, 10, 11],  # 5 beside 0 sharing a vertex
+            [0, 11, 12],  # 6 beside 0 sharing a vertex
+            [0, 10, 13],  # 7 overlapping 6 beyond their shared vertex
+        ]
+    )
+    pairs = numpy.array([[0, 1], [0, 2], [0, 3], [0, 4], [0, 5], [0, 6], [6, 7]])
+    assert triangles_intersect(v, f, pairs).tolist() == [
+        True,
+        True,
+        False,
+        True,
+        False,
+        False,
+        True,
+    ]
+
+
+def test_sliver_face():
+    """Test a closed mesh with a face of no area is not watertight."""
+
+    ms = mlab.MeshSet()
+    ms.create_sphere(radius=1, subdiv=2)
+    v = ms.current_mesh().vertex_matrix()
+    f = ms.current_mesh().face_matrix()
+
+    # Split the first face with a vertex in the middle of an edge, leaving a sliver along the edge
+    a, b, c = f[0]
+    v2 = numpy.vstack((v, (v[a] + v[b]) / 2))
+    m = len(v)
+    f2 = numpy.vstack((f[1:], [[a, m, c], [m, b, c], [a, b, m]]))
+    assert is_edge_manifold(f2)
+    assert has_self_intersections(v2, f2)
+    assert not is_watertight(mlab.Mesh(vertex_matrix=v2, face_matrix=f2))
+
+
+def test_overlapping_boxes():
+    """Test sort and sweep finds the pairs of boxes with overlapping interiors."""
+
+    boxes = numpy.array(
+        [
+            [0, 0, 0, 2, 2, 2],
+            [1, 1, 1, 3, 3, 3],
+            [2, 0, 0, 4, 2, 2],  # only touches box 0
+            [-numpy.inf] * 6,  # empty box
+            [0.5, 0.5, 0.5, 1.5, 1.5, 1.5],
+        ]
+    )
+    pairs = overlapping_boxes(boxes, chunk_size=2)
+    assert pairs.tolist() == [[0, 1], [0, 4], [1, 2], [1, 4]]
+
+
+def test_signed_distance():
+    """Test the BVH finds the closest points of a mesh and the side of points."""
+
+    ms = mlab.MeshSet()
+    ms.create_sphere(radius=1.0, subdiv=2)
+    v = ms.current_mesh().vertex_matrix()
+    f = ms.current_mesh().face_matrix()
+    points = numpy.random.default_rng(0).uniform(-1.5, 1.5, (500, 3))
+    d = TriangleBVH(v, f).signed_distance(points)
+
+    # Brute force distances to every face
+    k = numpy.repeat(numpy.arange(len(points)), len(f))
+    tri = v[numpy.tile(f, (len(points), 1))]
+    q, _ = closest_points_on_triangles(points[k], tri[:, 0], tri[:, 1], tri[:, 2])
+    dist = numpy.linalg.norm(points[k] - q, axis=1).reshape((len(points), -1))
+    assert numpy.allclose(numpy.abs(d), dist.min(axis=1), rtol=0, atol=1e-12)
+    d_pymeshlab = surface_distances(v, f, points)
+    assert numpy.allclose(d_pymeshlab, numpy.abs(d), rtol=0, atol=1e-6)
+
+    # Points away from the surface are outside when further than the sphere radius
+    r = numpy.linalg.norm(points, axis=1)
+    far = numpy.abs(r - 1) > 0.05
+    assert numpy.array_equal(d[far] > 0, r[far] > 1)
+
+
+def test_face_number_search():
+    """Test bisection and galloping searches agree with the linear search."""
+
+    for n in range(0, 20):
+        for first_success in range(0, n + 1):
+            for first_cap in range(0, n + 1):
+                attempt = lambda k: (
+                    k,
+                    k >= first_success,
+                    first_cap <= k < first_success,
+                )
+                linear, _ = search_smallest(attempt, n, "linear")
+                for search in ["bisection", "galloping"]:
+                    assert search_smallest(attempt, n, search)[0] == linear
+
+
+def test_parallel_simplification(tmp_path, monkeypatch):
+    """Test the parallel search finds the same mesh as the linear search, without leaving TetGen files."""
+
+    swc = Swc("test_data/test.swc", process=True)
+    ms = swc._build_initial_mesh()
+    ms.generate_alpha_wrap(alpha_fraction=0.05, offset_fraction=0.05 / 30)
+    alpha = MeshArrays.from_meshset(ms)
+    monkeypatch.chdir(tmp_path)
+    meshes = []
+    for search in ["linear", "parallel"]:
+        ms = simplify_mesh(alpha.to_meshset(), 20, 1.0, 20, search=search, workers=2)
+        meshes.append(MeshArrays.from_meshset(ms))
+    assert meshes[0].face_number == meshes[1].face_number
+    assert numpy.array_equal(meshes[0].v, meshes[1].v)
+
+    # TetGen checks run in a temporary directory, also when a name is given
+    for temp_dir_name in [None, str(tmp_path / "cell")]:
+        ms = simplify_mesh(
+            alpha.to_meshset(),
+            20,
+            1.0,
+            20,
+            temp_dir_name,
+            check_tetgen=True,
+            search="parallel",
+            workers=2,
+        )
+        assert ms is not None
+        assert os.listdir(tmp_path) == []
+
+    # Attempts terminated during a TetGen check leave their files behind
+    def interrupted_check(ms, temp_dir_name):
+        os.mkdir(temp_dir_name)
+        ms.save_current_mesh(os.path.join(temp_dir_name, "test.ply"), binary=False)
+        return True
+
+    monkeypatch.setattr(mesh_processing, "is_watertight_tetgen", interrupted_check)
+    simplify_mesh(
+        alpha.to_meshset(),
+        20,
+        1.0,
+        20,
+        str(tmp_path / "cell"),
+        check_tetgen=True,
+        search="parallel",
+        workers=2,
+    )
+    assert os.listdir(tmp_path) == []
+
+
+def test_mesh_container(tmp_path):
+    """Test meshes and metadata saved in a .npz container are read back unchanged."""
+
+    ms = mlab.MeshSet()
+    ms.load_new_mesh("test_data/test.ply")
+    name = str(tmp_path / "test.npz")
+    save_mesh(ms, name, metadata={"morphology": "test", "face_number": [138]})
+    ms_loaded = load_mesh(name)
+    assert numpy.array_equal(
+        ms_loaded.current_mesh().vertex_matrix(), ms.current_mesh().vertex_matrix()
+    )
+    assert numpy.array_equal(
+        ms_loaded.current_mesh().face_matrix(), ms.current_mesh().face_matrix()
+    )
+    assert load_metadata(name) == {"morphology": "test", "face_number": [138]}
+
+
+def test_h5_container(tmp_path):
+    """Test meshes and metadata saved in a .h5 container are read back unchanged."""
+
+    pytest.importorskip("h5py")
+    ms = mlab.MeshSet()
+    ms.load_new_mesh("test_data/test.ply")
+    name = str(tmp_path / "test.h5")
+    save_mesh(ms, name, metadata={"morphology": "test", "face_number": [138]})
+    ms_loaded = load_mesh(name)
+    assert numpy.array_equal(
+        ms_loaded.current_mesh().vertex_matrix(), ms.current_mesh().vertex_matrix()
+    )
+    assert numpy.array_equal(
+        ms_loaded.current_mesh().face_matrix(), ms.current_mesh().face_matrix()
+    )
+    assert load_metadata(name) == {"morphology": "test", "face_number": [138]}
+
+
+def test_mesh_files():
+    """Test ASCII copies written for TetGen are not listed as meshes."""
+
+    assert is_mesh_file("cell.ply")
+    assert is_mesh_file("cell.h5")
+    assert not is_mesh_file("cell_tetgen.ply")
+    assert not is_mesh_file("cell_log.txt")
+
+
+def test_mesh_arrays():
+    """Test MeshArrays holds read-only copies which round-trip through a MeshSet."""
+
+    ms = mlab.MeshSet()
+    ms.load_new_mesh("test_data/test.ply")
+    v = ms.current_mesh().vertex_matrix()
+    f = ms.current_mesh().face_matrix()
+    q = numpy.linalg.norm(v, axis=1)
+    ms.add_mesh(mlab.Mesh(vertex_matrix=v, face_matrix=f, v_scalar_array=q))
+    mesh = MeshArrays.from_meshset(ms)
+    for array in [mesh.v, mesh.f, mesh.q]:
+        assert not array.flags.writeable
+        with pytest.raises(ValueError):
+            array[0] = 0
+    assert mesh.face_number == len(f)
+
+    # Simplifying a MeshSet built from the arrays leaves them unchanged
+    ms_copy = mesh.to_meshset()
+    assert numpy.array_equal(ms_copy.current_mesh().vertex_matrix(), v)
+    assert numpy.array_equal(ms_copy.current_mesh().face_matrix(), f)
+    assert numpy.allclose(ms_copy.current_mesh().vertex_scalar_array(), q)
+    ms_copy.meshing_decimation_quadric_edge_collapse(targetfacenum=len(f) // 2)
+    assert ms_copy.current_mesh().face_number() < len(f)
+    assert numpy.array_equal(mesh.v, v)
+    assert numpy.array_equal(mesh.f, f)
+
+
+def test_array_cache(tmp_path):
+    """Test cached arrays are keyed by file contents and parameters."""
+
+    key = content_hash(["test_data/test.swc"], density=1.0)
+    copy = tmp_path / "copy.swc"
+    with open("test_data/test.swc", "rb") as f:
+        copy.write_bytes(f.read())
+    assert key == content_hash([str(copy)], density=1.0)
+    assert key != content_hash(["test_data/test.swc"], density=2.0)
+    name = cache_file(str(tmp_path / "cache"), "pc", key)
+    assert load_array(name) is None
+    save_array(name, numpy.arange(6.0).reshape((2, 3)))
+    assert numpy.array_equal(load_array(name), numpy.arange(6.0).reshape((2, 3)))
+    assert os.listdir(tmp_path / "cache") == [os.path.basename(name)]
+
+
+def test_swc_cache(tmp_path):
+    """Test processed Swc nodes are loaded from the cache and old entries are evicted."""
+
+    cache = LRUCache(str(tmp_path), max_size=10**9)
+    swc = Swc("test_data/test.swc", process=True, cache=False)
+    for hit in [0, 1]:
+        swc_cached = Swc("test_data/test.swc", process=True, cache=cache)
+        assert swc_cached.timings["swc_cache_hit"] == hit
+        for key in ["position_data", "radius_data", "conn_data", "type_data"]:
+            assert numpy.array_equal(getattr(swc_cached, key), getattr(swc, key))
+        assert numpy.array_equal(swc_cached.branches, swc.branches)
+        assert swc_cached.preamble == swc.preamble
+
+    # Only the most recently used entry fits in the cache
+    Swc("test_data/test.swc", process=False, cache=cache)
+    files = sorted(tmp_path.iterdir(), key=lambda file: file.stat().st_mtime)
+    cache.max_size = files[-1].stat().st_size
+    cache.evict()
+    assert len(os.listdir(tmp_path)) == 1
+    assert Swc("test_data/test.swc", cache=cache).timings["swc_cache_hit"] == 1
+
+
+def test_shape_measures():
+    """Test shape measures of regular and degenerate tetrahedra."""
+
+    nodes = numpy.array(
+        [[1, 1, 1], [1, -1, -1], [-1, 1, -1], [-1, -1, 1], [0, 0, 0]], dtype=float
+    )
+    elements = numpy.array([[0, 1, 2, 3], [1, 0, 2, 3], [0, 1, 2, 4], [0, 4, 4, 1]])
+    q = shape_measures(nodes, elements)
+    assert numpy.allclose(q[:2], 1)
+    assert 0 < q[2] < 1
+    assert q[3] == 0
+
+
 def test_node_processing():
     """"Test node processing against known output"""
 
@@ -33,6 +398,323 @@ def test_node_processing():
     assert numpy.linalg.norm(swc.type_data - swc_clean.type_data) < 1e-12
     assert numpy.linalg.norm(swc.conn_data - swc_clean.conn_data) < 1e-12
 
+def test_subtree_size():
+    """Test subtree sizes of a forest with shuffled nodes against a recursive count."""
+
+    rng = numpy.random.default_rng(0)
+    N = 300
+    parents = numpy.array([-1] + [rng.integers(max(0, i - 5), i) for i in range(1, N)])
+    parents[rng.random(N) < 0.02] = -1
+    permutation = rng.permutation(N)
+    inverse = numpy.argsort(permutation)
+    parents = numpy.where(parents >= 0, inverse[numpy.maximum(parents, 0)], -1)[
+        permutation
+    ]
+    topology = Topology(numpy.stack((numpy.arange(N), parents), axis=1))
+
+    count = lambda i: 1 + sum(count(j) for j in topology.children_of(i))
+    assert topology.subtree_size.tolist() == [count(i) for i in range(0, N)]
+
+
+def test_extract_swc(tmp_path):
+    """Test reading 0- and 1-based swc files with scale headers and small radii."""
+
+    one_based = tmp_path / "one_based.swc"
+    one_based.write_text(
+        "# ORIGINAL_SOURCE test\n"
+        "# SCALE 2.0 2.0 2.0\n"
+        "1 1 0.0 0.0 0.0 2.0 -1\n"
+        "2 3 1.0 0.0 0.0 1.0 1\n"
+        "3 3 2.0 0.0 0.0 0.0 2\n"
+        "# SCALE 1.0 1.0 1.0\n"
+        "4 3 0.0 3.0 0.0 0.5 1\n"
+    )
+    with pytest.warns(Warning, match="Node id 3: radius to small"):
+        position_data, radius_data, conn_data, type_data, preamble = extract_swc(
+            str(one_based)
+        )
+    assert preamble == ["# ORIGINAL_SOURCE test\n"]
+    assert numpy.array_equal(conn_data, [[0, -1], [1, 0], [2, 1], [3, 0]])
+    assert numpy.array_equal(type_data, [1, 3, 3, 3])
+    assert numpy.array_equal(
+        position_data, [[0, 0, 0], [2, 0, 0], [4, 0, 0], [0, 3, 0]]
+    )
+    # The radius of node 3 is reset to the radius of its parent
+    assert numpy.array_equal(radius_data, [2.0, 1.0, 1.0, 0.5])
+
+    # 0-based ids are kept, also for nodes after the first
+    zero_based = tmp_path / "zero_based.swc"
+    zero_based.write_text(
+        "0 3 0.0 0.0 0.0 2.0 -1\n"
+        "1 3 1.0 0.0 0.0 1.0 0\n"
+        "2 3 2.0 0.0 0.0 1.0 1\n"
+        "3 3 0.0 3.0 0.0 0.5 0\n"
+    )
+    with pytest.warns(RuntimeWarning, match="Soma absent"):
+        position_data, radius_data, conn_data, type_data, preamble = extract_swc(
+            str(zero_based)
+        )
+    assert preamble == []
+    assert numpy.array_equal(conn_data, [[0, -1], [1, 0], [2, 1], [3, 0]])
+    # The first point becomes a synthetic soma
+    assert numpy.array_equal(type_data, [-1, 3, 3, 3])
+    assert numpy.array_equal(radius_data, [2.0, 1.0, 1.0, 0.5])
+
+
+def test_reordering():
+    """Test reordering restores parent before child order for shuffled and relabelled nodes."""
+
+    position_data, radius_data, conn_data, type_data, _ = extract_swc(
+        "test_data/826_5_3.swc"
+    )
+    N = len(conn_data)
+    rng = numpy.random.default_rng(0)
+    ids = rng.permutation(N) + 5
+    permutation = rng.permutation(N)
+    has_parent = conn_data[:, 1] >= 0
+    shuffled_conn_data = numpy.stack(
+        (
+            ids[conn_data[:, 0]],
+            numpy.where(has_parent, ids[numpy.maximum(conn_data[:, 1], 0)], -1),
+        ),
+        axis=1,
+    )[permutation]
+    p, r, c, t = reorder_swc(
+        position_data[permutation],
+        radius_data[permutation],
+        shuffled_conn_data,
+        type_data[permutation],
+    )
+    assert is_ordered(c)
+
+    # The edges of the tree are preserved
+    edges = lambda p, c: sorted(
+        map(tuple, numpy.hstack((p[c[:, 1] >= 0], p[c[c[:, 1] >= 0, 1]])).tolist())
+    )
+    assert edges(p, c) == edges(position_data, conn_data)
+
+
+def test_tendril_sweep():
+    """Test tubes swept at once match the stepwise transport of the disk along each branch."""
+
+    swc = Swc("test_data/test.swc", process=True)
+    ms = mlab.MeshSet()
+    ms.create_sphere(radius=1)
+    v_S = ms.current_mesh().vertex_matrix()
+    f_S = ms.current_mesh().face_matrix()
+    for branch in numpy.unique(swc.branches[swc.branches > 0]):
+        nodes = swc.topology.branch_nodes(branch)
+        nodes = numpy.hstack((swc.conn_data[nodes[0], 1], nodes))
+        tendril = Tendril.from_data(swc.position_data[nodes], swc.radius_data[nodes], 0)
+        v, f = tendril.make_mesh(v_S, f_S)
+
+        # Stepwise sweep
+        n = int(max([5, numpy.floor(15 * numpy.mean(tendril.r))]))
+        steps = (len(v) - 2 * len(v_S)) // n
+        v0 = make_initial_vertices(tendril, n)
+        t = numpy.linspace(0, 1, steps)
+        v_step = [v0]
+        f_step = []
+        for i in range(1, steps):
+            v0 = tendril.transport(t[i - 1], t[i], v0)
+            v_step.append(v0)
+            f_step.append(make_faces(n, i * n))
+        v_step = numpy.hstack(v_step).T
+        assert numpy.allclose(v[: n * steps], v_step, rtol=0, atol=1e-9 * tendril.L)
+        assert numpy.array_equal(f[: (steps - 1) * 2 * n], numpy.vstack(f_step))
+
+
+def test_parallel_initial_mesh():
+    """Test building the tubes in worker processes gives the same initial mesh."""
+
+    swc = Swc("test_data/test.swc", process=True)
+    ms1 = swc._build_initial_mesh(workers=1)
+    ms2 = swc._build_initial_mesh(workers=2)
+    m1, m2 = ms1.current_mesh(), ms2.current_mesh()
+    assert m1.vertex_number() == m2.vertex_number()
+    assert m1.face_number() == m2.face_number()
+    assert numpy.array_equal(m1.vertex_matrix(), m2.vertex_matrix())
+    assert numpy.array_equal(m1.face_matrix(), m2.face_matrix())
+
+
+def test_concatenate_meshes():
+    """Test concatenated meshes match merging visible layers of two overlapping tubes."""
+
+    ms = mlab.MeshSet()
+    ms.create_sphere(radius=1)
+    v_S = ms.current_mesh().vertex_matrix()
+    f_S = ms.current_mesh().face_matrix()
+    p = numpy.array([[0.0, 0.0, 0.0], [5.0, 0.0, 0.0], [10.0, 1.0, 0.0]])
+    r = numpy.array([1.0, 1.0, 0.8])
+    parts = [
+        make_tendril_mesh(p, r, v_S, f_S),
+        make_tendril_mesh(p[::-1] + [0.0, 0.5, 0.0], r[::-1], v_S, f_S),
+    ]
+
+    ms.clear()
+    for v, f in parts:
+        ms.add_mesh(mlab.Mesh(vertex_matrix=v, face_matrix=f))
+    ms.generate_by_merging_visible_meshes()
+    ms.meshing_remove_duplicate_vertices()
+    merged = ms.current_mesh()
+    v_merged, f_merged = merged.vertex_matrix(), merged.face_matrix()
+
+    ms_concat = mlab.MeshSet()
+    ms_concat.add_mesh(mlab.Mesh(*concatenate_meshes(parts)))
+    ms_concat.meshing_remove_duplicate_vertices()
+    concat = ms_concat.current_mesh()
+    v_concat, f_concat = concat.vertex_matrix(), concat.face_matrix()
+
+    assert len(v_concat) == len(v_merged)
+    assert len(f_concat) == len(f_merged)
+    assert numpy.array_equal(
+        numpy.unique(v_concat, axis=0), numpy.unique(v_merged, axis=0)
+    )
+    assert numpy.array_equal(
+        numpy.unique(numpy.sort(v_concat[f_concat], axis=1), axis=0),
+        numpy.unique(numpy.sort(v_merged[f_merged], axis=1), axis=0),
+    )
+
+
+def test_segment_cloud():
+    """Test the segment cloud samples the same points as Sphere and Frustum."""
+
+    swc = Swc("test_data/test.swc", process=True)
+    cloud = SegmentCloud.from_swc(
+        swc.position_data, swc.radius_data, swc.conn_data, swc.type_data
+    )
+    node = lambda i: {
+        "type": swc.type_data[i],
+        "position": swc.position_data[i],
+        "radius": swc.radius_data[i],
+    }
+    for i, j in swc.conn_data:
+        if swc.type_data[i] == 1 or j == -1:
+            seg = Sphere(node(i), 1.0)
+        else:
+            seg = Frustum(node(j), node(i), 1.0)
+        points, normals, colors = cloud.output(i=i)
+        assert numpy.allclose(points, seg.points, rtol=0, atol=1e-12)
+        assert numpy.allclose(normals, seg.normals, rtol=0, atol=1e-12)
+        assert numpy.array_equal(colors, seg.output()[2])
+
+
+def test_remove_interior_points():
+    """Test interior points are removed in one pass as by checking pairs one at a time."""
+
+    swc = Swc("test_data/test.swc", process=True)
+    cloud = SegmentCloud.from_swc(
+        swc.position_data, swc.radius_data, swc.conn_data, swc.type_data
+    )
+    pairs = swc.aabb(cloud)
+    keep = cloud.keep.copy()
+    for p, c in pairs:
+        _, on, outer, _ = cloud.intersect(c, p)
+        keep[cloud.point_slice(p)] &= on | outer
+        keep[cloud.point_slice(c)] &= cloud.intersect(p, c)[2]
+    cloud.remove_interior_points(pairs, chunk_size=1000)
+    assert numpy.array_equal(cloud.keep, keep)
+
+
+def test_alpha_cache(tmp_path):
+    """Test alpha wrapped meshes are loaded from the cache unchanged."""
+
+    cache = LRUCache(str(tmp_path), "alpha")
+    meshes = []
+    for hit in [0, 1]:
+        swc = Swc("test_data/test.swc", process=True, cache=False)
+        _, _, ms_alpha = swc.make_mesh(save=False, alpha_cache=cache)
+        assert swc.timings["alpha_cache_hit"] == hit
+        m = ms_alpha.current_mesh()
+        meshes.append((m.vertex_matrix(), m.face_matrix()))
+    assert numpy.array_equal(meshes[0][0], meshes[1][0])
+    assert numpy.array_equal(meshes[0][1], meshes[1][1])
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_batch_workers(tmp_path, workers):
+    """Test a failing cell is logged without stopping the other cells."""
+
+    input_dir = tmp_path / "swc"
+    output_dir = tmp_path / "meshes"
+    input_dir.mkdir()
+    with open("test_data/test.swc", "r") as f:
+        (input_dir / "good.swc").write_text(f.read())
+    (input_dir / "broken.swc").write_text("1 1 0.0 0.0 0.0 1.0 5\n")
+    subprocess.run(
+        [
+            sys.executable,
+            "batch_mesh_swc.py",
+            str(input_dir),
+            "--output_dir",
+            str(output_dir),
+            "--workers",
+            workers,
+            "--simplify",
+            "0",
+            "--store_data",
+            "0",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    assert os.path.isfile(output_dir / "good.ply")
+    assert not os.path.isfile(output_dir / "broken.ply")
+    with open(output_dir / "Failed_meshes.txt", "r") as f:
+        failures = f.read()
+    assert "broken.swc" in failures
+    assert "Parent of the first node must be -1." in failures
+    assert "good.swc" not in failures
+
+
+def test_batch_large_errors(tmp_path, monkeypatch):
+    """Test workers sending errors larger than the pipe buffer do not stall the batch."""
+
+    import multiprocessing
+    import threading
+    import batch_mesh_swc
+
+    def fail(file, **kwargs):
+        raise RuntimeError("x" * 200000)
+
+    monkeypatch.setattr(batch_mesh_swc, "mesh_file", fail)
+    monkeypatch.setattr(batch_mesh_swc, "MAX_ERROR_LENGTH", 300000)
+    files = []
+    for name in ["a.swc", "b.swc", "c.swc"]:
+        (tmp_path / name).write_text("1 1 0.0 0.0 0.0 1.0 -1\n")
+        files.append(str(tmp_path / name))
+    batch = threading.Thread(
+        target=batch_mesh_swc.mesh_files_parallel,
+        args=(files, 2, {"output_dir": str(tmp_path)}),
+        daemon=True,
+    )
+    batch.start()
+    batch.join(timeout=60)
+    stalled = batch.is_alive()
+    for process in multiprocessing.active_children():
+        process.terminate()
+    assert not stalled
+    with open(tmp_path / "Failed_meshes.txt", "r") as f:
+        failures = f.read()
+    assert all(f"Error with {file}:" in failures for file in files)
+    assert failures.count("x" * 200000) == 3
+
+
+def test_summary_rollback(tmp_path):
+    """Test a failed summary write keeps the previous summary."""
+
+    pytest.importorskip("matplotlib")
+    import sqlite3
+    from batch_SkeletonMeshError import write_summary
+
+    write_summary(str(tmp_path), [{"mesh": "a.ply", "error": 1.0}])
+    with pytest.raises(sqlite3.Error):
+        write_summary(str(tmp_path), [{"mesh": "b.ply", "error": {"max": 2.0}}])
+    conn = sqlite3.connect(str(tmp_path / "summary.db"))
+    assert conn.execute("SELECT * FROM summary").fetchall() == [("a.ply", 1.0)]
+    conn.close()
+
+
 def test_meshing():
     """Test meshing algorithm.
     """